@@ -0,0 +1,128 @@
+"""Batched value iteration over many small navigator instances at once"""
+
+import time
+
+import numpy as np
+
+from mdp_model import as_model, build_model
+
+
+def pack_models(models):
+    """
+    Pack several compiled models into one block-diagonal model.
+
+    The actions of all models are merged by name, and the states of model i occupy the state ids
+    `offsets[i]:offsets[i + 1]` of the packed model.
+
+    Args:
+        models (list): `MDPModel` instances.
+
+    Returns:
+        tuple: The packed `MDPModel` and the array of state offsets, of length len(models) + 1.
+    """
+    actions = []
+    action_index = dict()
+    for model in models:
+        for action in model.actions:
+            if action not in action_index:
+                action_index[action] = len(actions)
+                actions.append(action)
+
+    offsets = np.concatenate([[0], np.cumsum([model.n_states for model in models])]).astype(np.int64)
+    N = int(offsets[-1])
+    rows, cols, probs, costs = [], [], [], []
+    for model, offset in zip(models, offsets):
+        n = model.n_states
+        T = model.T.tocoo()
+        action_map = np.array([action_index[action] for action in model.actions], dtype=np.int64)
+        rows.append(action_map[T.row // n] * N + offset + T.row % n)
+        cols.append(offset + T.col)
+        probs.append(T.data)
+        costs.append(model.transition_costs())
+
+    names = [f'{i}:{name}' for i, model in enumerate(models) for name in model.name_list()]
+    packed = build_model(names, actions, np.concatenate(rows), np.concatenate(cols), np.concatenate(probs),
+                         np.concatenate([model.goal for model in models]),
+                         np.concatenate([model.deadend for model in models]),
+                         np.concatenate([model.heuristic for model in models]), np.concatenate(costs))
+
+    # Keep the costs of each model, including infinite costs of actions it does not have
+    C = np.full((len(actions), N), np.inf)
+    for model, offset in zip(models, offsets):
+        C[[action_index[action] for action in model.actions], offset:offset + model.n_states] = model.C
+    packed.C = C
+    return packed, offsets
+
+
+def solve_batch(instances, gamma=0.9, epsilon=1e-6, stats=None):
+    """
+    Perform value iteration on many instances in one vectorized pass.
+
+    The instances are packed into a block-diagonal model and every sweep backs up all the states
+    still being solved with a single sparse mat-vec product. Each instance stops on its own
+    convergence test, exactly as `value_iteration` would on it alone, and the packed matrix is
+    shrunk to the remaining instances as they converge.
+
+    Args:
+        instances (list): Dictionaries returned by `load_json` or compiled `MDPModel` instances.
+        gamma (float): Discount factor for future costs.
+        epsilon (float): Small value for determining convergence of the value function.
+        stats (dict, optional): If given, filled with the number of instances and sweeps, the
+            solve time in milliseconds and the throughput in instances per second.
+
+    Returns:
+        list: A (V, policy, iterations) tuple per instance, as returned by `value_iteration`.
+    """
+    start = time.perf_counter()
+    models = [as_model(instance) for instance in instances]
+    if not models:
+        if stats is not None:
+            stats.update(instances=0, sweeps=0, solve_time_ms=0.0, instances_per_second=0.0)
+        return []
+    packed, offsets = pack_models(models)
+    n_actions, N = packed.n_actions, packed.n_states
+    sizes = np.diff(offsets)
+    owner = np.repeat(np.arange(len(models)), sizes)
+
+    V = np.zeros(N)
+    Q = np.zeros((n_actions, N))
+    iterations = np.zeros(len(models), dtype=np.int64)
+    active = sizes > 0
+    sweeps = 0
+    while active.any():
+        # Restrict the packed matrix to the states of the instances still being solved
+        states = np.flatnonzero(active[owner])
+        rows = (np.arange(n_actions)[:, None] * N + states).ravel()
+        T_active = packed.T[rows]
+        C_active = packed.C[:, states]
+        bounds = np.concatenate([[0], np.cumsum(sizes[active])])[:-1]
+        solving = np.flatnonzero(active)
+        while True:
+            Q_active = C_active + gamma * (T_active @ V).reshape(n_actions, len(states))
+            new_V = Q_active.min(axis=0)
+            residual = np.maximum.reduceat(np.abs(new_V - V[states]), bounds)
+            V[states] = new_V
+            Q[:, states] = Q_active
+            iterations[solving] += 1
+            sweeps += 1
+            converged = residual < epsilon
+            if converged.any():
+                active[solving[converged]] = False
+                break
+
+    results = []
+    policy = Q.argmin(axis=0)
+    for i, model in enumerate(models):
+        block = slice(offsets[i], offsets[i + 1])
+        # Map the packed action ids back to the action ids of the instance
+        local = np.zeros(n_actions, dtype=np.int64)
+        local[[packed.actions.index(action) for action in model.actions]] = np.arange(model.n_actions)
+        results.append((model.value_dict(V[block]), model.policy_dict(local[policy[block]]), int(iterations[i])))
+
+    if stats is not None:
+        elapsed = time.perf_counter() - start
+        stats['instances'] = len(models)
+        stats['sweeps'] = sweeps
+        stats['solve_time_ms'] = elapsed * 1000
+        stats['instances_per_second'] = len(models) / elapsed if elapsed > 0 else float('inf')
+    return results
@@ -0,0 +1,249 @@
+"""Benchmark suite for the solvers, with separate load and solve phases"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import scipy
+
+from generator import generate, navigator_name
+from iteration_policy import policy_iteration
+from iteration_value import value_iteration
+from loader import load
+
+# Solvers measured by the benchmark
+BENCH_SOLVERS = {'value_iteration': value_iteration,
+                 'policy_iteration': policy_iteration}
+
+# Synthetic navigator sizes (nx, ny), from the size of the real instances upwards
+SIZES = ((3, 15), (10, 10), (20, 20), (40, 40), (80, 80))
+
+
+def time_runs(function, warmup=1, repeats=5):
+    """
+    Time repeated calls of a function with `time.perf_counter_ns`.
+
+    As in `timeit`, the garbage collector is disabled while a call runs, so collections triggered by
+    earlier runs do not land in the measurement.
+
+    Args:
+        function (callable): Function without arguments.
+        warmup (int): Number of untimed calls made first.
+        repeats (int): Number of timed calls.
+
+    Returns:
+        tuple: The list of durations in nanoseconds and the result of the last call.
+    """
+    result = None
+    for _ in range(warmup):
+        result = function()
+    samples = []
+    enabled = gc.isenabled()
+    try:
+        for _ in range(repeats):
+            gc.collect()
+            gc.disable()
+            start = time.perf_counter_ns()
+            result = function()
+            samples.append(time.perf_counter_ns() - start)
+            if enabled:
+                gc.enable()
+    finally:
+        if enabled:
+            gc.enable()
+    return samples, result
+
+
+def summarize(samples):
+    """
+    Summarize durations in nanoseconds.
+
+    Returns:
+        dict: Median, interquartile range, minimum and maximum in milliseconds, and number of samples.
+    """
+    samples_ms = np.asarray(samples, dtype=np.float64) / 10**6
+    q1, median, q3 = np.percentile(samples_ms, [25, 50, 75])
+    return {'median_ms': float(median),
+            'iqr_ms': float(q3 - q1),
+            'min_ms': float(samples_ms.min()),
+            'max_ms': float(samples_ms.max()),
+            'repeats': len(samples)}
+
+
+def measure_memory(function):
+    """
+    Measure the memory allocated by one call of a function with `tracemalloc`.
+
+    This is a separate pass from the timed runs, since tracing slows every allocation down.
+
+    Returns:
+        dict: Current and peak traced memory in KB at the end of the call.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'memory_current_kb': current / 10**3, 'memory_peak_kb': peak / 10**3}
+
+
+def bench_instance(name, load_function, algorithms, gammas, epsilon=1e-6, warmup=1, repeats=5):
+    """
+    Benchmark the load phase of an instance and the solve phase of every solver on it.
+
+    Args:
+        name (str): Name of the instance in the records.
+        load_function (callable): Function without arguments that returns the compiled model.
+        algorithms (list): Solver names, keys of `BENCH_SOLVERS`.
+        gammas (list): Discount factors.
+        epsilon (float): Convergence threshold.
+        warmup (int): Number of untimed runs of every phase.
+        repeats (int): Number of timed runs of every phase.
+
+    Returns:
+        list: One record for the load phase and one per (algorithm, gamma) solve phase.
+    """
+    samples, model = time_runs(load_function, warmup, repeats)
+    load_record = {'instance': name, 'phase': 'load', 'n_states': model.n_states,
+                   'model_kb': model.nbytes / 10**3}
+    load_record.update(summarize(samples))
+    load_record.update(measure_memory(load_function))
+    records = [load_record]
+
+    for algorithm in algorithms:
+        solver = BENCH_SOLVERS[algorithm]
+        for gamma in gammas:
+            def solve():
+                return solver(model, gamma=gamma, epsilon=epsilon)
+
+            samples, (V, policy, iterations) = time_runs(solve, warmup, repeats)
+            record = {'instance': name, 'phase': 'solve', 'n_states': model.n_states,
+                      'algorithm': algorithm, 'gamma': gamma, 'epsilon': epsilon,
+                      'iterations': iterations}
+            record.update(summarize(samples))
+            record.update(measure_memory(solve))
+            records.append(record)
+    return records
+
+
+def environment():
+    """Describe the machine and code version the benchmark ran on."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'scipy': scipy.__version__,
+            'machine': platform.machine(),
+            'platform': platform.platform()}
+
+
+def run_benchmark(files=(), sizes=SIZES, algorithms=tuple(BENCH_SOLVERS), gammas=(0.9, 0.99), epsilon=1e-6,
+                  warmup=1, repeats=5, cache=True, directory=None):
+    """
+    Run the benchmark suite on JSON files and on synthetic navigator instances.
+
+    Args:
+        files (list): Paths of JSON files.
+        sizes (list): (nx, ny) sizes of the synthetic instances, written by `generator.generate`.
+        algorithms (list): Solver names, keys of `BENCH_SOLVERS`.
+        gammas (list): Discount factors.
+        epsilon (float): Convergence threshold.
+        warmup (int): Number of untimed runs of every phase.
+        repeats (int): Number of timed runs of every phase.
+        cache (bool): Load the JSON files through the binary cache, otherwise parse them on every load.
+        directory (str, optional): Directory of the synthetic instances. Instances already there are
+            reused. Defaults to a temporary directory removed at the end.
+
+    Returns:
+        dict: The environment and the list of records.
+    """
+    for algorithm in algorithms:
+        if algorithm not in BENCH_SOLVERS:
+            raise ValueError(f"Unknown algorithm {algorithm!r}, expected one of {list(BENCH_SOLVERS)}")
+    with tempfile.TemporaryDirectory() as temporary:
+        directory = directory or temporary
+        # Synthetic instances are named by their file name, so that records compare across directories
+        instances = [(file_path, file_path) for file_path in files]
+        for nx, ny in sizes:
+            path = os.path.join(directory, navigator_name(nx, ny))
+            if not os.path.exists(path):
+                generate(nx, ny, directory)
+            instances.append((navigator_name(nx, ny), path))
+
+        records = []
+        for name, file_path in instances:
+            records.extend(bench_instance(name, lambda: load(file_path, cache=cache)[0],
+                                          algorithms, gammas, epsilon, warmup, repeats))
+    return {'environment': environment(), 'records': records}
+
+
+def record_key(record):
+    return (record['instance'], record['phase'], record.get('algorithm'), record.get('gamma'))
+
+
+def compare(baseline, results):
+    """
+    Compare the median times of two benchmark results, e.g. from two commits.
+
+    Returns:
+        list: (record key, baseline median, new median, speedup) for the records found in both.
+    """
+    previous = {record_key(record): record for record in baseline['records']}
+    rows = []
+    for record in results['records']:
+        old = previous.get(record_key(record))
+        if old is not None:
+            speedup = old['median_ms'] / record['median_ms'] if record['median_ms'] > 0 else float('inf')
+            rows.append((record_key(record), old['median_ms'], record['median_ms'], speedup))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the solvers on real and synthetic navigator instances")
+    parser.add_argument('files', nargs='*', help="JSON files to benchmark")
+    parser.add_argument('--sizes', nargs='*', default=[f'{nx}x{ny}' for nx, ny in SIZES],
+                        help="Synthetic instance sizes as NXxNY")
+    parser.add_argument('--algorithms', nargs='+', default=list(BENCH_SOLVERS), choices=list(BENCH_SOLVERS))
+    parser.add_argument('--gammas', nargs='+', type=float, default=[0.9, 0.99])
+    parser.add_argument('--epsilon', type=float, default=1e-6)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--no-cache', action='store_true', help="Parse the JSON files on every load")
+    parser.add_argument('--instances-dir', help="Keep the synthetic instances in this directory")
+    parser.add_argument('--output', default='benchmark_output.json')
+    parser.add_argument('--compare', help="Earlier benchmark output to compare the medians with")
+    args = parser.parse_args(argv)
+
+    sizes = [tuple(int(value) for value in size.split('x')) for size in args.sizes]
+    results = run_benchmark(args.files, sizes, args.algorithms, args.gammas, args.epsilon,
+                            args.warmup, args.repeats, not args.no_cache, args.instances_dir)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    for record in results['records']:
+        label = record['phase'] if record['phase'] == 'load' else f"{record['algorithm']} gamma={record['gamma']}"
+        print(f"{record['instance']:<40} {label:<30} {record['median_ms']:>10.3f} ms "
+              f"(IQR {record['iqr_ms']:.3f}) peak {record['memory_peak_kb']:.1f} KB")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for key, old, new, speedup in compare(baseline, results):
+            print(f"{' '.join(str(part) for part in key if part is not None):<60} {old:>10.3f} -> {new:>10.3f} ms ({speedup:.2f}x)")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""Command line entry point: python3 cli.py {solve,sweep,bench,render} ..."""
+
+import argparse
+import importlib
+import inspect
+import sys
+import time
+
+START = time.perf_counter()
+
+# Solvers by name, imported only when a subcommand needs them
+SOLVERS = {'value_iteration': ('iteration_value', 'value_iteration'),
+           'prioritized_value_iteration': ('iteration_value', 'prioritized_value_iteration'),
+           'policy_iteration': ('iteration_policy', 'policy_iteration'),
+           'lao_star': ('heuristic_search', 'lao_star'),
+           'lrtdp': ('heuristic_search', 'lrtdp'),
+           'ssp': ('ssp', 'ssp_solve')}
+
+# Solvers that return only the states reachable from the initial state
+PARTIAL_SOLVERS = ('lao_star', 'lrtdp')
+
+
+def get_solver(name):
+    """Import a solver of `SOLVERS` by name."""
+    module, function = SOLVERS[name]
+    return getattr(importlib.import_module(module), function)
+
+
+def solver_options(args):
+    """Collect the solver options given on the command line, leaving the rest to the solver defaults."""
+    options = dict()
+    for option in ('topological', 'random_values'):
+        if getattr(args, option):
+            options[option] = True
+    for option in ('scheme', 'evaluation', 'workers'):
+        if getattr(args, option) is not None:
+            options[option] = getattr(args, option)
+    if options.get('workers') is not None:
+        from main import extract_dimensions
+        try:
+            options['nx'] = extract_dimensions(args.file)[0]
+        except ValueError:
+            pass
+    return options
+
+
+def run_solver(args, parser):
+    """
+    Load the file of `args` and solve it.
+
+    Returns:
+        tuple: The model, value function, policy, iteration count, load time and solve time in milliseconds.
+    """
+    from loader import load
+    solver = get_solver(args.algorithm)
+    options = solver_options(args)
+    if args.algorithm not in PARTIAL_SOLVERS:
+        options['output'] = 'float64'
+    unsupported = [option for option in options if option not in inspect.signature(solver).parameters]
+    if unsupported:
+        parser.error(f"{args.algorithm} does not support {', '.join(unsupported)}")
+    # Undiscounted solvers take no gamma
+    gamma = {'gamma': args.gamma} if 'gamma' in inspect.signature(solver).parameters else dict()
+    model, load_info = load(args.file)
+    if args.deadend != 'legacy':
+        from mdp_model import deadend_model
+        model = deadend_model(model, args.deadend, args.deadend_penalty)
+    start = time.perf_counter()
+    V, policy, iterations = solver(model, epsilon=args.epsilon, **gamma, **options)
+    return model, V, policy, iterations, load_info['load_time_ms'], (time.perf_counter() - start) * 1000
+
+
+def solve(args, parser):
+    """Solve one map and write its solution to stdout or to a file."""
+    model, V, policy, iterations, load_ms, solve_ms = run_solver(args, parser)
+    if args.output:
+        if args.algorithm in PARTIAL_SOLVERS:
+            parser.error(f"{args.algorithm} does not solve every state; print its solution instead of --output")
+        from results import write_results
+        write_results(args.output, model, V, policy)
+    elif not args.quiet:
+        lines = (f"{state}\t{policy[state]}\t{V[state]:.6f}" for state in V)
+        sys.stdout.write('\n'.join(lines) + '\n')
+        sys.stdout.flush()
+    print(f"{args.algorithm}: {iterations} iterations; load {load_ms:.2f} ms; solve {solve_ms:.2f} ms; "
+          f"first result after {(time.perf_counter() - START) * 1000:.2f} ms", file=sys.stderr)
+
+
+def render(args, parser):
+    """Solve one navigator map and plot its policy."""
+    from iteration_value import plot_policy
+    from main import extract_dimensions
+    try:
+        nx, ny = extract_dimensions(args.file)
+    except ValueError as error:
+        parser.error(str(error))
+    _, _, policy, _, _, _ = run_solver(args, parser)
+    plot_policy(dict(policy), nx, ny, args.image, mode=args.mode)
+    print(f"Policy plot written to {args.image}", file=sys.stderr)
+
+
+def add_solver_arguments(parser):
+    parser.add_argument('file', help="JSON file or .mdpcache file of the map")
+    parser.add_argument('--algorithm', default='value_iteration', choices=list(SOLVERS))
+    parser.add_argument('--gamma', type=float, default=0.9)
+    parser.add_argument('--epsilon', type=float, default=1e-6)
+    parser.add_argument('--random-values', action='store_true')
+    parser.add_argument('--topological', action='store_true')
+    parser.add_argument('--scheme', choices=['jacobi', 'gauss-seidel', 'sor'], help="value_iteration update scheme")
+    parser.add_argument('--evaluation', choices=['iterative', 'exact', 'modified'], help="policy_iteration evaluation mode")
+    parser.add_argument('--workers', type=int, help="Worker processes for the Jacobi sweeps")
+    parser.add_argument('--deadend', choices=['legacy', 'penalty', 'absorbing'], default='legacy',
+                        help="Dead end handling (see mdp_model.deadend_model)")
+    parser.add_argument('--deadend-penalty', type=float,
+                        help="Dead end cost of --deadend penalty or absorbing; defaults to the number of states "
+                             "times the largest action cost")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve, sweep, benchmark and render navigation MDPs")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    solve_parser = subparsers.add_parser('solve', help="Solve one map")
+    add_solver_arguments(solve_parser)
+    solve_parser.add_argument('--output', help="Write the solution to a .csv, .npy or .parquet file")
+    solve_parser.add_argument('--quiet', action='store_true', help="Only print the summary")
+
+    render_parser = subparsers.add_parser('render', help="Solve one map and plot its policy")
+    add_solver_arguments(render_parser)
+    render_parser.add_argument('--image', default='policy_plot.png')
+    render_parser.add_argument('--mode', choices=['artists', 'vector', 'raster'], default='vector')
+
+    # The sweep and bench subcommands hand their arguments to the scripts of the same name
+    subparsers.add_parser('sweep', add_help=False, help="Parameter sweep (see sweep.py --help)")
+    subparsers.add_parser('bench', add_help=False, help="Benchmark suite (see benchmark.py --help)")
+
+    args, rest = parser.parse_known_args(argv)
+    if args.command == 'sweep':
+        from sweep import main as sweep_main
+        sweep_main(rest)
+    elif args.command == 'bench':
+        from benchmark import main as bench_main
+        bench_main(rest)
+    else:
+        if rest:
+            parser.error(f"unrecognized arguments: {' '.join(rest)}")
+        {'solve': solve, 'render': render}[args.command](args, parser)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""Synthetic navigator instances for scale testing"""
+
+import argparse
+import json
+import os
+
+import numpy as np
+
+from loader import CACHE_SUFFIX, cache_path, file_hash, save_cache
+from mdp_model import build_model
+
+# Displacement (dx, dy) of each action, with y growing towards the bottom row
+MOVES = {'N': (0, -1), 'S': (0, 1), 'E': (1, 0), 'W': (-1, 0)}
+
+# Slip probability to the dead end on the top and bottom rows
+SLIP = (0.2, 0.8)
+
+
+def navigator_name(nx, ny, a=0, b=0, suffix='.json'):
+    """Get the file name of an instance, in the pattern that `main.extract_dimensions` reads."""
+    return f'navigator{nx}-{ny}-{a}-{b}{suffix}'
+
+
+def slip_probability(y, ny, slip=SLIP):
+    """Slip probability of the stochastic cells of row `y`, growing linearly from top to bottom."""
+    return slip[0] + (slip[1] - slip[0]) * y / max(ny - 1, 1)
+
+
+def navigator_states(nx, ny, slip=SLIP):
+    """
+    Generate the states of a navigator instance one at a time, in the format of `load_json`.
+
+    The layout follows the real maps: the goal is the bottom right cell, the dead end is state
+    nx * ny + 1, the border columns are deterministic and the inner columns slip to the dead end
+    with probability `slip_probability`. Moving into a wall leaves the agent in place.
+
+    Args:
+        nx (int): Number of columns.
+        ny (int): Number of rows.
+        slip (tuple): Slip probability on the top and bottom rows.
+
+    Yields:
+        tuple: The state name and its dictionary.
+    """
+    goal = nx * ny
+    deadend = nx * ny + 1
+    for s in range(1, nx * ny + 1):
+        x, y = (s - 1) % nx, (s - 1) // nx
+        state = {'goal': s == goal, 'deadend': False, 'heuristic': (nx - 1 - x) + (ny - 1 - y), 'Adj': []}
+        if s == goal:
+            state['Adj'].append({'name': str(s), 'A': {action: 1 for action in MOVES}})
+            yield str(s), state
+            continue
+
+        stochastic = 0 < x < nx - 1
+        p = slip_probability(y, ny, slip) if stochastic else 0
+        successors = dict()
+        for action, (dx, dy) in MOVES.items():
+            if 0 <= x + dx < nx and 0 <= y + dy < ny:
+                successor = str(s + dx + dy * nx)
+            else:
+                successor = str(s)
+            successors.setdefault(successor, dict())[action] = 1 - p
+        if stochastic:
+            state['Adj'].append({'name': str(deadend), 'A': {action: p for action in MOVES}})
+        state['Adj'].extend({'name': name, 'A': A} for name, A in successors.items())
+        yield str(s), state
+
+    yield str(deadend), {'goal': False, 'deadend': True, 'heuristic': 0,
+                         'Adj': [{'name': str(deadend), 'A': {action: 1 for action in MOVES}}]}
+
+
+def navigator_instance(nx, ny, slip=SLIP):
+    """Build a whole navigator instance in memory, as `load_json` would return it."""
+    return dict(navigator_states(nx, ny, slip))
+
+
+def write_json(file_path, nx, ny, slip=SLIP, indent=None):
+    """
+    Write a navigator instance to a JSON file, one state at a time.
+
+    Args:
+        file_path (str): Path of the JSON file.
+        nx (int): Number of columns.
+        ny (int): Number of rows.
+        slip (tuple): Slip probability on the top and bottom rows.
+        indent (int, optional): Indentation of the JSON output, e.g. 2 as in the real maps.
+            Defaults to a compact file.
+    """
+    separator = ',\n' if indent is not None else ','
+    prefix = ' ' * (indent or 0)
+    with open(file_path, 'w') as f:
+        f.write('{\n' if indent is not None else '{')
+        for i, (name, state) in enumerate(navigator_states(nx, ny, slip)):
+            if i:
+                f.write(separator)
+            text = json.dumps(state, indent=indent)
+            if indent is not None:
+                text = text.replace('\n', '\n' + prefix)
+            f.write(f'{prefix}{json.dumps(name)}: {text}')
+        f.write('\n}' if indent is not None else '}')
+
+
+def navigator_actions(nx, ny, slip=SLIP):
+    """Get the actions in the order in which they first appear in the instance, as `stream_model` numbers them."""
+    actions = []
+    for _, state in navigator_states(nx, ny, slip):
+        for adj in state['Adj']:
+            for action in adj['A']:
+                if action not in actions:
+                    actions.append(action)
+        if len(actions) == len(MOVES):
+            return actions
+    return actions
+
+
+def navigator_model(nx, ny, slip=SLIP):
+    """
+    Build the compiled model of a navigator instance directly from its layout, without any JSON.
+
+    The model is the same, array for array, as the one `loader.stream_model` compiles from the file
+    written by `write_json`.
+
+    Args:
+        nx (int): Number of columns.
+        ny (int): Number of rows.
+        slip (tuple): Slip probability on the top and bottom rows.
+
+    Returns:
+        MDPModel: The compiled model.
+    """
+    cells = nx * ny
+    n = cells + 1
+    deadend = cells
+    states = np.arange(cells)
+    x, y = states % nx, states // nx
+    # Every cell but the goal has outgoing transitions
+    moving = states[:-1]
+    stochastic = (x[moving] > 0) & (x[moving] < nx - 1)
+    p = np.where(stochastic, slip_probability(y[moving], ny, slip), 0)
+
+    actions = navigator_actions(nx, ny, slip)
+    rows, cols, probs = [], [], []
+    for a, action in enumerate(actions):
+        dx, dy = MOVES[action]
+        inside = (x[moving] + dx >= 0) & (x[moving] + dx < nx) & (y[moving] + dy >= 0) & (y[moving] + dy < ny)
+        rows.append(a * n + moving)
+        cols.append(np.where(inside, moving + dx + dy * nx, moving))
+        probs.append(1 - p)
+        rows.append(a * n + moving[stochastic])
+        cols.append(np.full(int(stochastic.sum()), deadend))
+        probs.append(p[stochastic])
+        rows.append([a * n + deadend])
+        cols.append([deadend])
+        probs.append([1.0])
+
+    goal = np.zeros(n, dtype=bool)
+    goal[cells - 1] = True
+    deadends = np.zeros(n, dtype=bool)
+    deadends[deadend] = True
+    heuristic = np.zeros(n, dtype=np.float64)
+    heuristic[:cells] = (nx - 1 - x) + (ny - 1 - y)
+    names = [str(s) for s in range(1, n + 1)]
+    return build_model(names, actions, np.concatenate(rows), np.concatenate(cols), np.concatenate(probs),
+                       goal, deadends, heuristic)
+
+
+def generate(nx, ny, directory='json_files', a=0, b=0, slip=SLIP, json_file=True, binary=True, indent=None):
+    """
+    Write a navigator instance to disk as JSON, as a binary model cache, or both.
+
+    With both formats the cache is stored next to the JSON file and keyed to it, so `loader.load`
+    finds it warm on the first load. With the binary format alone, a standalone `.mdpcache` file is
+    written that `loader.load` opens directly.
+
+    Args:
+        nx (int): Number of columns.
+        ny (int): Number of rows.
+        directory (str): Output directory.
+        a (int): First index of the file name.
+        b (int): Second index of the file name.
+        slip (tuple): Slip probability on the top and bottom rows.
+        json_file (bool): Write the JSON file.
+        binary (bool): Write the binary model cache.
+        indent (int, optional): Indentation of the JSON output.
+
+    Returns:
+        str: Path of the JSON file, or of the standalone cache file when no JSON was written.
+    """
+    if not json_file and not binary:
+        raise ValueError("At least one of json_file and binary must be True")
+    os.makedirs(directory, exist_ok=True)
+    if not json_file:
+        path = os.path.join(directory, navigator_name(nx, ny, a, b, CACHE_SUFFIX))
+        save_cache(navigator_model(nx, ny, slip), path, None)
+        return path
+
+    path = os.path.join(directory, navigator_name(nx, ny, a, b))
+    write_json(path, nx, ny, slip, indent)
+    if binary:
+        info = os.stat(path)
+        source = {'size': info.st_size, 'mtime_ns': info.st_mtime_ns, 'sha256': file_hash(path)}
+        save_cache(navigator_model(nx, ny, slip), cache_path(path), source)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic navigator instances")
+    parser.add_argument('sizes', nargs='+', help="Instance sizes as NXxNY")
+    parser.add_argument('--directory', default='json_files')
+    parser.add_argument('--slip', nargs=2, type=float, default=list(SLIP), help="Slip probability on the top and bottom rows")
+    parser.add_argument('--format', choices=['json', 'binary', 'both'], default='both')
+    parser.add_argument('--indent', type=int, default=None)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        nx, ny = (int(value) for value in size.split('x'))
+        path = generate(nx, ny, args.directory, slip=tuple(args.slip), json_file=args.format != 'binary',
+                        binary=args.format != 'json', indent=args.indent)
+        print(f"{nx * ny + 1} states written to {path}")
+
+
+if __name__ == "__main__":
+    main()
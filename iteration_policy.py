@@ -1,101 +1,389 @@
 import random
 
-def policy_iteration(states, gamma=0.9, epsilon=1e-6, random_values=False, seed=42):
+from state_table import build_state_table, table_from_model
+
+# NumPy and SciPy are optional: without them only the pure-Python backend is available
+try:
+    import numpy as np
+    import scipy.sparse as sp
+    from scipy.sparse.linalg import spsolve
+
+    from mdp_model import MDPModel, as_model
+    from results import solver_output
+    from topology import component_rows, topological_plan
+except ImportError:
+    np = None
+
+EVALUATION_MODES = ('iterative', 'exact', 'modified')
+BACKENDS = ('auto', 'numpy', 'python')
+
+# An action only replaces the current one if it is better by more than this fraction of epsilon,
+# relative to the magnitude of the value, so round-off of the evaluation cannot flip exact ties
+TIE_TOLERANCE = 1e-3
+
+def policy_iteration(states, gamma=0.9, epsilon=1e-6, random_values=False, seed=42,
+                     evaluation='iterative', k=20, topological=False, initial_values=None, initial_policy=None,
+                     stats=None, tracer=None, backend='auto', output='dict', workers=None, nx=None):
     """
     Perform policy iteration to find the optimal policy and value function.
 
+    Policy evaluation and improvement are vectorized sparse mat-vec products over the compiled model,
+    or index loops over a `StateTable` with the pure-Python backend.
+
+    Dead ends are solved with the transitions of the model. To make them terminal with a penalty or
+    absorbing at a chosen cost, pass the model through `mdp_model.deadend_model` first.
+
     Args:
-        states (dict): A dictionary where keys are state names and values are dictionaries with state information.
+        states (dict or MDPModel): A dictionary where keys are state names and values are dictionaries
+            with state information, or a model already compiled with `compile_model`.
         gamma (float): Discount factor for future costs.
         epsilon (float): Small value for determining convergence of the value function.
+        evaluation (str): Policy evaluation mode. 'iterative' sweeps until the value function changes less
+            than epsilon, 'exact' solves (I - gamma * P_pi) V = c_pi with a sparse direct solver and
+            'modified' runs `k` sweeps per evaluation (modified policy iteration).
+        k (int): Number of evaluation sweeps per iteration in 'modified' mode.
+        topological (bool): Prune the states that cannot reach a goal and run policy iteration on the
+            strongly connected components in reverse topological order. The iteration count is then
+            the total over all components.
+        initial_values (dict or np.ndarray, optional): Warm start from a previous value function.
+            Overrides `random_values`.
+        initial_policy (dict or np.ndarray, optional): Warm start from a previous policy.
+            Overrides `random_values`.
+        stats (dict, optional): If given, filled with the evaluation mode and the number of inner sweeps
+            and factorizations performed, and the number of components and pruned states of a
+            topological solve.
+        tracer (Tracer, optional): Receives a record after every improvement step, with the number of
+            inner evaluation sweeps it used (see `telemetry.Tracer`). When a budget of the tracer runs
+            out, the run stops and returns the last improved policy.
+        backend (str): 'numpy', 'python' (no NumPy or SciPy needed; 'exact' evaluation and topological
+            solves are not supported) or 'auto', which picks 'numpy' when it is installed. Both backends
+            return the same policies and iteration counts.
+        output (str): 'dict' returns dictionaries keyed by state name. 'float64' or 'float32' return a
+            dense value array and int8 action codes wrapped in read-only dictionary views (see
+            `results.solver_output`). Needs the numpy backend.
+        workers (int, optional): Run the 'iterative' or 'modified' evaluation sweeps on this many worker
+            processes, each one owning a block of states (see `parallel.ParallelEngine`). The result is
+            the same as with one process. Needs the numpy backend.
+        nx (int, optional): Number of columns of the navigator grid, to give each worker whole grid rows.
 
     Returns:
         V (dict): The value function for each state.
         policy (dict): The optimal policy for each state.
         iterations (int): Number of iterations performed.
     """
+    if evaluation not in EVALUATION_MODES:
+        raise ValueError(f"Unknown evaluation mode {evaluation!r}, expected one of {EVALUATION_MODES}")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+    if backend == 'auto':
+        backend = 'python' if np is None else 'numpy'
+    if backend == 'python':
+        if output != 'dict':
+            raise ValueError("The python backend only returns 'dict' outputs")
+        if evaluation == 'exact' or topological:
+            raise ValueError("The python backend supports neither 'exact' evaluation nor topological solves")
+        if workers is not None:
+            raise ValueError("The python backend does not support parallel evaluation")
+        table = table_from_model(states) if np is not None and isinstance(states, MDPModel) else build_state_table(states)
+        return _python_policy_iteration(table, gamma, epsilon, random_values, seed, evaluation, k,
+                                        initial_values, initial_policy, stats, tracer)
+    if np is None:
+        raise ImportError("The numpy backend of policy_iteration needs numpy and scipy")
+    if workers is not None and (evaluation == 'exact' or topological):
+        raise ValueError("Parallel evaluation supports neither 'exact' evaluation nor topological solves")
+    model = as_model(states)
+    available = model.available
+
     # Map to store available actions for each state
-    action_per_value = dict()
-    for state in states:
-        actions = []
-        for adj in states[state]['Adj']:
-            actions.extend(adj['A'].keys())
-        action_per_value[state] = list(set(actions))
-    
+    action_per_value = [np.flatnonzero(available[:, s]) for s in range(model.n_states)]
+
     # Initialize value function for each state to 0
     random.seed(seed)
-    V = {state: random.randint(1, 10) if random_values else 0 for state in states}
+    if initial_values is not None:
+        V = model.value_array(initial_values)
+    else:
+        V = np.array([random.randint(1, 10) if random_values else 0 for _ in range(model.n_states)], dtype=np.float64)
+    V[model.goal] = 0
 
-    # Initialize a policy with an arbitrary action 'N' for each state or a random value in ['N', 'S', 'W', 'E']
-    policy = {state: random.choice(action_per_value[state]) if random_values else 'N' for state in states}    
-
-    def get_action_value(state, action):
-        """
-        Compute the value of taking a specific action in a given state.
+    # Initialize a policy with an arbitrary action 'N' for each state or a random available action
+    default_action = model.actions.index('N') if 'N' in model.actions else 0
+    policy = np.array([random.choice(actions) if random_values and initial_policy is None else
+                       (default_action if available[default_action, s] else actions[0])
+                       for s, actions in enumerate(action_per_value)], dtype=np.int64)
+    if initial_policy is not None:
+        policy = model.policy_array(initial_policy, policy)
 
-        Args:
-            state (str): The state name.
-            action (str): The action to evaluate.
+    inner_sweeps = 0
+    factorizations = 0
+    backups = 0
+    if tracer is not None:
+        tracer.start('policy_iteration')
 
-        Returns:
-            float: The computed value of the action.
-        """
-        value = 0
-        for adj in states[state]['Adj']:
-            if action in adj['A']:
-                prob = adj['A'][action]
-                value += prob * (1 + gamma * V[adj['name']])
-        return value
-
-    def evaluate_policy():
+    def evaluate_policy(S):
         """
-        Evaluate the current policy by updating the value function until convergence.
+        Evaluate the current policy on the states `S` with the selected evaluation mode.
+        The values of the other states are kept fixed.
         """
+        nonlocal inner_sweeps, factorizations, backups
+        if engine is not None:
+            return evaluate_parallel(S)
+        P_pi = model.T[policy[S] * model.n_states + S]
+        c_pi = model.C[policy[S], S]
+        if evaluation == 'exact':
+            if len(S) < model.n_states:
+                # Fold the transitions that leave S into the right-hand side
+                outside = np.ones(model.n_states, dtype=bool)
+                outside[S] = False
+                c_pi = c_pi + gamma * (P_pi[:, outside] @ V[outside])
+                P_pi = P_pi[:, S]
+            A = sp.identity(len(S), format='csc') - gamma * P_pi.tocsc()
+            V[S] = spsolve(A, c_pi)
+            factorizations += 1
+            backups += len(S)
+            return 0
+        sweeps = 0
         while True:
-            delta = 0
-            for state in states:
-                if states[state]['goal']:
-                    continue
-                v = V[state]
-                V[state] = get_action_value(state, policy[state])
-                delta = max(delta, abs(v - V[state]))
+            new_V = c_pi + gamma * (P_pi @ V)
+            delta = np.max(np.abs(new_V - V[S]), initial=0)
+            V[S] = new_V
+            sweeps += 1
+            backups += len(S)
+            if evaluation == 'modified' and sweeps == k:
+                break
             if delta < epsilon:
                 break
+            if tracer is not None and tracer.over_budget(backups):
+                break
+        inner_sweeps += sweeps
+        return sweeps
+
+    def evaluate_parallel(S):
+        """Evaluate the current policy on all the states with the sweeps of the parallel engine."""
+        nonlocal inner_sweeps, backups
+        engine.load_values(V)
+        engine.set_policy(policy)
+        sweeps = 0
+        while True:
+            delta = engine.evaluation_sweep()
+            sweeps += 1
+            backups += len(S)
+            if evaluation == 'modified' and sweeps == k:
+                break
+            if delta < epsilon:
+                break
+            if tracer is not None and tracer.over_budget(backups):
+                break
+        V[:] = engine.values
+        inner_sweeps += sweeps
+        return sweeps
 
-    def improve_policy():
+    def improve_policy(S):
         """
-        Improve the current policy by making it greedy with respect to the current value function.
+        Improve the current policy on the states `S` by making it greedy with respect to the current value function.
 
         Returns:
             bool: True if the policy is stable (no changes), False otherwise.
         """
-        policy_stable = True
-        for state in states:
-            # if states[state]['goal'] or states[state]['deadend']:
-            #     policy[state] = 'goal' if states[state]['goal'] else 'deadend'
-            #     continue
-            if states[state]['goal']:
-                policy[state] = 'goal'
-                continue
-            old_action = policy[state]
-            action_values = {action: get_action_value(state, action) for action in action_per_value[state]}
-            best_action = min(action_values, key=action_values.get)
-            policy[state] = best_action
-            if old_action != best_action:
-                policy_stable = False
-        return policy_stable
+        nonlocal residual, changed, backups
+        rows = component_rows(model, S)
+        Q = model.C[:, S] + gamma * (model.T[rows] @ V).reshape(model.n_actions, len(S))
+        residual = np.max(np.abs(Q.min(axis=0) - V[S]), initial=0)
+        columns = np.arange(len(S))
+        best_action = Q.argmin(axis=0)
+        # Keep the current action on ties so that the loop terminates
+        current = Q[policy[S], columns]
+        keep = Q[best_action, columns] >= current - TIE_TOLERANCE * epsilon * np.maximum(1, np.abs(current))
+        best_action[keep] = policy[S][keep]
+        changed = int(np.count_nonzero(best_action != policy[S]))
+        policy[S] = best_action
+        backups += len(S)
+        return changed == 0
+
+    def solve(S):
+        """
+        Run policy iteration on the states `S`.
 
+        Returns:
+            int: Number of iterations performed.
+        """
+        nonlocal stopped
+        iterations = 0
+        while True:
+            sweeps = evaluate_policy(S)
+            policy_stable = improve_policy(S)
+            iterations += 1
+            if tracer is not None:
+                # Components are numbered in the records, and iterations are counted over all of them
+                extra = dict() if component is None else {'component': component}
+                stopped = tracer.record(done + iterations, residual, changed, backups, inner_sweeps=sweeps, **extra)
+                if stopped:
+                    return iterations
+            # A partial evaluation can leave a stable policy with an inaccurate value function
+            if policy_stable and (evaluation != 'modified' or residual < epsilon):
+                return iterations
+
+    residual = np.inf
+    changed = 0
+    stopped = False
+    component = None
+    engine = None
+    done = 0
+    if topological:
+        components, pruned = topological_plan(model, V, gamma)
+        for component, S in enumerate(components):
+            done += solve(S)
+            if stopped:
+                break
+        iterations = done
+        if stats is not None:
+            stats['components'] = len(components)
+            stats['pruned_states'] = pruned
+    elif workers is not None:
+        from parallel import ParallelEngine
+        with ParallelEngine(model, gamma, workers, nx) as engine:
+            iterations = solve(np.arange(model.n_states))
+    else:
+        iterations = solve(np.arange(model.n_states))
+
+    if stats is not None:
+        stats['evaluation'] = evaluation
+        stats['inner_sweeps'] = inner_sweeps
+        stats['factorizations'] = factorizations
+        stats['backups'] = backups
+        if tracer is not None:
+            stats['stop_reason'] = tracer.stop_reason
+
+    V, policy = solver_output(model, V, policy, output)
+    return V, policy, iterations
+
+
+def _python_policy_iteration(table, gamma, epsilon, random_values, seed, evaluation, k,
+                             initial_values, initial_policy, stats, tracer):
+    """
+    Policy iteration over a `StateTable`, with the same semantics as the numpy backend.
+
+    Evaluation sweeps are Jacobi sweeps into a second preallocated value list, and the improvement
+    step scans the action slots of each state, so the loops only index into the precomputed lists.
+    """
+    n = table.n_states
+    names = table.names
+    goal = table.goal
+    action_ptr, action_ids, costs = table.action_ptr, table.action_ids, table.costs
+    succ_ptr, succ, probs = table.succ_ptr, table.succ, table.probs
+
+    # Initialize value function for each state to 0
+    random.seed(seed)
+    if initial_values is not None:
+        V = [float(initial_values[name]) for name in names]
+    else:
+        V = [float(random.randint(1, 10)) if random_values else 0.0 for _ in range(n)]
+    for s in range(n):
+        if goal[s]:
+            V[s] = 0.0
+
+    # Slot of the current action of each state, -1 for goal states
+    default_action = table.actions.index('N') if 'N' in table.actions else 0
+    policy = [-1] * n
+    for s in range(n):
+        slots = range(action_ptr[s], action_ptr[s + 1])
+        if goal[s]:
+            # Goal states can take any action, as in the compiled model, and consume the same draws
+            if random_values and initial_policy is None:
+                random.choice(range(len(table.actions)))
+            continue
+        if random_values and initial_policy is None:
+            policy[s] = random.choice(slots)
+        else:
+            policy[s] = next((slot for slot in slots if action_ids[slot] == default_action), slots[0])
+    if initial_policy is not None:
+        action_index = {action: a for a, action in enumerate(table.actions)}
+        for s in range(n):
+            a = action_index.get(initial_policy.get(names[s]), -1)
+            for slot in range(action_ptr[s], action_ptr[s + 1]):
+                if action_ids[slot] == a:
+                    policy[s] = slot
+
+    def backup(slot):
+        value = 0.0
+        for i in range(succ_ptr[slot], succ_ptr[slot + 1]):
+            value += probs[i] * V[succ[i]]
+        return costs[slot] + gamma * value
+
+    inner_sweeps = 0
+    backups = 0
+    new_V = [0.0] * n
     iterations = 0
+    if tracer is not None:
+        tracer.start('policy_iteration')
     while True:
-        evaluate_policy()
-        policy_stable = improve_policy()
+        # Policy evaluation
+        sweeps = 0
+        while True:
+            delta = 0.0
+            for s in range(n):
+                slot = policy[s]
+                value = 0.0
+                if slot >= 0:
+                    for i in range(succ_ptr[slot], succ_ptr[slot + 1]):
+                        value += probs[i] * V[succ[i]]
+                    value = costs[slot] + gamma * value
+                change = abs(value - V[s])
+                if change > delta:
+                    delta = change
+                new_V[s] = value
+            V, new_V = new_V, V
+            sweeps += 1
+            backups += n
+            if evaluation == 'modified' and sweeps == k:
+                break
+            if delta < epsilon:
+                break
+            if tracer is not None and tracer.over_budget(backups):
+                break
+        inner_sweeps += sweeps
+
+        # Policy improvement, keeping the current action on ties
+        residual = 0.0
+        changed = 0
+        for s in range(n):
+            current = policy[s]
+            if current < 0:
+                continue
+            current_value = backup(current)
+            best_slot, best_value = current, float('inf')
+            for slot in range(action_ptr[s], action_ptr[s + 1]):
+                value = backup(slot)
+                if value < best_value:
+                    best_slot, best_value = slot, value
+            # Residual against the best value over all actions, as in the numpy backend
+            if abs(best_value - V[s]) > residual:
+                residual = abs(best_value - V[s])
+            if best_value < current_value - TIE_TOLERANCE * epsilon * max(1.0, abs(current_value)):
+                policy[s] = best_slot
+                changed += 1
+        backups += n
         iterations += 1
-        if policy_stable:
+
+        if tracer is not None and tracer.record(iterations, residual, changed, backups, inner_sweeps=sweeps):
+            break
+        # A partial evaluation can leave a stable policy with an inaccurate value function
+        if changed == 0 and (evaluation != 'modified' or residual < epsilon):
             break
 
-    for state in states:
-        if states[state]['deadend']:
-            policy[state] = 'deadend'
-    
-    return V, policy, iterations
+    if stats is not None:
+        stats['evaluation'] = evaluation
+        stats['inner_sweeps'] = inner_sweeps
+        stats['factorizations'] = 0
+        stats['backups'] = backups
+        if tracer is not None:
+            stats['stop_reason'] = tracer.stop_reason
 
+    result = dict()
+    for s in range(n):
+        if table.deadend[s]:
+            result[names[s]] = 'deadend'
+        elif goal[s]:
+            result[names[s]] = 'goal'
+        else:
+            result[names[s]] = table.actions[action_ids[policy[s]]]
+    return dict(zip(names, V)), result, iterations
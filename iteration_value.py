@@ -1,83 +1,372 @@
 """Algorithm for Value Iteration"""
 
-import matplotlib.pyplot as plt
+import heapq
+import numpy as np
 import random
 
-def value_iteration(states, gamma=0.9, epsilon=1e-6, random_values=False, seed=42):
+from mdp_model import as_model
+from results import solver_output
+from topology import component_rows, goal_distance, successor_graph, topological_plan
+
+UPDATE_SCHEMES = ('jacobi', 'gauss-seidel', 'sor')
+STATE_ORDERINGS = ('distance', 'heuristic', 'index')
+STOPPING_RULES = ('delta', 'bound')
+# States per level of the 'index' ordering, whose keys have no ties to group by
+INDEX_LEVEL_SIZE = 256
+
+def level_keys(model, ordering='distance'):
+    """
+    Group the states into the levels of the in-place sweeps, closest to the goal first.
+
+    Args:
+        model (MDPModel): The compiled model.
+        ordering (str): 'distance' groups by the number of transitions to a goal in the `Adj` graph,
+            'heuristic' by the `heuristic` field and 'index' by blocks of `INDEX_LEVEL_SIZE` state ids.
+
+    Returns:
+        np.ndarray: Level key per state. Lower keys are swept first.
+    """
+    if ordering not in STATE_ORDERINGS:
+        raise ValueError(f"Unknown state ordering {ordering!r}, expected one of {STATE_ORDERINGS}")
+    if ordering == 'distance':
+        return goal_distance(model)
+    if ordering == 'heuristic':
+        return np.asarray(model.heuristic, dtype=np.float64)
+    return np.arange(model.n_states) // INDEX_LEVEL_SIZE
+
+def state_ordering(model, ordering='distance'):
+    """
+    Order the states for in-place sweeps, closest to the goal first (see `level_keys`).
+
+    Returns:
+        np.ndarray: State ids in sweeping order.
+    """
+    return np.argsort(level_keys(model, ordering), kind='stable')
+
+def sweep_levels(model, S, keys, gamma):
+    """
+    Build the tables of an in-place sweep over the states `S`, one per level of equal key.
+
+    The self-loop of an action is removed from its transition rows and solved exactly: the backup
+    is divided by 1 - gamma * p(s|s,a), folded into the costs and discounts of the level.
+
+    Args:
+        model (MDPModel): The compiled model.
+        S (np.ndarray): State ids to sweep.
+        keys (np.ndarray): Level key per state (see `level_keys`).
+        gamma (float): Discount factor for future costs.
+
+    Returns:
+        list: States, transition rows without the solved self-loops, scaled costs and scaled
+            discounts of each level, in sweeping order.
+    """
+    S = S[np.argsort(keys[S], kind='stable')]
+    sorted_keys = keys[S]
+    cuts = np.flatnonzero(sorted_keys[1:] != sorted_keys[:-1]) + 1
+    levels = []
+    for L in np.split(S, cuts):
+        T_L = model.T[component_rows(model, L)]
+        row = np.repeat(np.arange(T_L.shape[0]), np.diff(T_L.indptr))
+        loop = T_L.indices == L[row % len(L)]
+        stay = np.bincount(row[loop], weights=T_L.data[loop], minlength=T_L.shape[0])
+        solved = (stay > 0) & (gamma * stay < 1)
+        scale = np.ones(T_L.shape[0])
+        scale[solved] = 1 / (1 - gamma * stay[solved])
+        scale = scale.reshape(model.n_actions, len(L))
+        T_L.data[loop & solved[row]] = 0
+        T_L.eliminate_zeros()
+        levels.append((L, T_L, model.C[:, L] * scale, gamma * scale))
+    return levels
+
+def value_iteration(states, gamma=0.9, epsilon=1e-6, random_values=False, seed=42, topological=False,
+                    initial_values=None, stats=None, tracer=None, scheme='jacobi', omega=1.0,
+                    ordering='distance', stopping='delta', output='dict', workers=None, nx=None):
     """
     Perform value iteration to find the optimal policy and value function.
 
+    Jacobi sweeps are vectorized Bellman backups over the compiled sparse model. Gauss-Seidel and SOR
+    sweeps update the states in place, level by level in the order given by `ordering` (block
+    Gauss-Seidel): the states of a level are backed up together with one vectorized product, and
+    each level already sees the new values of the levels before it. In place, the self-loop of an
+    action is solved exactly, dividing its backup by 1 - gamma * p(s|s,a), so states that mostly
+    stay put (walls, dead ends) converge in one update.
+
+    Dead ends are solved with the transitions of the model. To make them terminal with a penalty or
+    absorbing at a chosen cost, pass the model through `mdp_model.deadend_model` first.
+
     Args:
-        states (dict): A dictionary where keys are state names and values are dictionaries with state information.
+        states (dict or MDPModel): A dictionary where keys are state names and values are dictionaries
+            with state information, or a model already compiled with `compile_model`.
         gamma (float): Discount factor for future costs.
         epsilon (float): Small value for determining convergence of the value function.
+        topological (bool): Prune the states that cannot reach a goal and solve the strongly connected
+            components in reverse topological order (Topological Value Iteration). The iteration count
+            is then the total number of component sweeps.
+        stats (dict, optional): If given, filled with the number of state backups, and the number of
+            components and pruned states of a topological solve.
+        tracer (Tracer, optional): Receives a record after every sweep (see `telemetry.Tracer`). When a
+            budget of the tracer runs out, the run stops and returns the greedy policy of the current
+            value function.
+        scheme (str): Update scheme, 'jacobi', 'gauss-seidel' or 'sor'.
+        omega (float): Relaxation factor of 'sor', between 0 and 2 / (1 + gamma). 1 is Gauss-Seidel.
+            Over-relaxation of the min in the Bellman backup is only a contraction below that bound,
+            so larger factors are rejected.
+        ordering (str): Levels of the in-place schemes (see `level_keys`).
+        stopping (str): 'delta' stops when the largest change of a sweep is below epsilon. 'bound'
+            stops below epsilon * (1 - gamma) / gamma, which guarantees that the value function is
+            within epsilon of the optimal one.
+        output (str): 'dict' returns dictionaries keyed by state name. 'float64' or 'float32' return a
+            dense value array and int8 action codes wrapped in read-only dictionary views (see
+            `results.solver_output`).
+        workers (int, optional): Run the Jacobi sweeps on this many worker processes, each one owning a
+            block of states (see `parallel.ParallelEngine`). The result is the same as with one process.
+        nx (int, optional): Number of columns of the navigator grid, to give each worker whole grid rows.
 
     Returns:
         V (dict): The value function for each state.
         policy (dict): The optimal policy for each state.
         iteration (int): Number of iterations performed.
     """
+    if scheme not in UPDATE_SCHEMES:
+        raise ValueError(f"Unknown update scheme {scheme!r}, expected one of {UPDATE_SCHEMES}")
+    if stopping not in STOPPING_RULES:
+        raise ValueError(f"Unknown stopping rule {stopping!r}, expected one of {STOPPING_RULES}")
+    if scheme == 'sor' and not 0 < omega < 2 / (1 + gamma):
+        raise ValueError(f"The relaxation factor must be between 0 and 2 / (1 + gamma) = {2 / (1 + gamma):.4g}, "
+                         f"got {omega}")
+    if scheme == 'gauss-seidel':
+        omega = 1.0
+    if workers is not None and (scheme != 'jacobi' or topological):
+        raise ValueError("Parallel sweeps support only the 'jacobi' scheme without topological solves")
+    model = as_model(states)
+    threshold = epsilon * (1 - gamma) / gamma if stopping == 'bound' and gamma > 0 else epsilon
+
     # Initialize value function for each state to 0
     random.seed(seed)
-    V = {state: random.randint(1, 100) if random_values else 0 for state in states}
+    if initial_values is not None:
+        V = model.value_array(initial_values)
+    else:
+        V = np.array([random.randint(1, 100) if random_values else 0 for _ in range(model.n_states)], dtype=np.float64)
 
-    # Initialize an empty policy
-    policy = {state: None for state in states}
+    if scheme != 'jacobi':
+        keys = level_keys(model, ordering)
 
-    def get_min_action_value(state):
+    def sweep(levels):
         """
-        Compute the minimum value of taking any action in a given state.
+        Update the levels of `sweep_levels` in place with a Gauss-Seidel or SOR backup.
+
+        Returns:
+            float: The largest change of a value.
+        """
+        delta = 0.0
+        for L, T_L, costs, discounts in levels:
+            best = (costs + discounts * (T_L @ V).reshape(model.n_actions, len(L))).min(axis=0)
+            change = omega * (best - V[L])
+            V[L] += change
+            level_delta = np.max(np.abs(change), initial=0)
+            if not np.isfinite(level_delta):
+                # max() would drop a NaN and report convergence
+                raise ValueError(f"The {scheme} sweeps diverged (omega={omega}, gamma={gamma})")
+            delta = max(delta, level_delta)
+        return delta
+
+    iteration = 0
+    backups = 0
+    stopped = False
+    if tracer is not None:
+        tracer.start('value_iteration')
+        # Greedy action of the previous sweep, to count the changed actions
+        previous = np.full(model.n_states, -1)
 
-        Args:
-            state (str): The state name.
+    def solve(S, T_S, C_S, component=None, engine=None):
+        """
+        Sweep the states `S` until their values converge. The values of the other states are kept fixed.
+        With a `ParallelEngine`, the Jacobi sweeps over all the states run on its workers.
 
         Returns:
-            tuple: Minimum value and the best action.
+            np.ndarray: The action values of the last Jacobi sweep, or None for the in-place schemes.
         """
+        nonlocal V, iteration, backups, stopped
+        Q = None
+        levels = sweep_levels(model, S, keys, gamma) if scheme != 'jacobi' else None
+        extra = dict() if component is None else {'component': component}
+        while True:
+            if engine is not None:
+                delta = engine.sweep()
+            elif scheme == 'jacobi':
+                Q = C_S + gamma * (T_S @ V).reshape(model.n_actions, len(S))
+                new_V = Q.min(axis=0)
+                delta = np.max(np.abs(new_V - V[S]), initial=0)
+                V[S] = new_V
+            else:
+                delta = sweep(levels)
+
+            iteration += 1
+            backups += len(S)
+            if tracer is not None:
+                if scheme != 'jacobi':
+                    Q = C_S + gamma * (T_S @ V).reshape(model.n_actions, len(S))
+                elif engine is not None:
+                    Q = C_S + gamma * (T_S @ engine.previous).reshape(model.n_actions, len(S))
+                greedy = Q.argmin(axis=0)
+                stopped = tracer.record(iteration, delta, np.count_nonzero(greedy != previous[S]), backups, **extra)
+                previous[S] = greedy
+            if stopped or delta < threshold:
+                if engine is not None:
+                    # Action values of the last sweep, from the values it started from
+                    Q = C_S + gamma * (T_S @ engine.previous).reshape(model.n_actions, len(S))
+                    V = engine.values.copy()
+                return Q
+
+    if topological:
+        components, pruned = topological_plan(model, V, gamma)
+        for c, component in enumerate(components):
+            # Successor components are already solved, so only this block is swept
+            solve(component, model.T[component_rows(model, component)], model.C[:, component], c)
+            if stopped:
+                break
+        if stats is not None:
+            stats['components'] = len(components)
+            stats['pruned_states'] = pruned
+    elif workers is not None:
+        from parallel import ParallelEngine
+        with ParallelEngine(model, gamma, workers, nx) as engine:
+            engine.load_values(V)
+            Q = solve(np.arange(model.n_states), model.T, model.C, engine=engine)
+    else:
+        Q = solve(np.arange(model.n_states), model.T, model.C)
+
+    if topological or scheme != 'jacobi':
+        Q = model.q_values(V, gamma)
+    policy = Q.argmin(axis=0)
+    if stats is not None:
+        stats['backups'] = backups
+        if tracer is not None:
+            stats['stop_reason'] = tracer.stop_reason
+
+    V, policy = solver_output(model, V, policy, output)
+    return V, policy, iteration
+
+def prioritized_value_iteration(states, gamma=0.9, epsilon=1e-6, random_values=False, seed=42,
+                                initial_values=None, stats=None, output='dict'):
+    """
+    Perform value iteration with prioritized sweeping.
+
+    States are backed up one at a time, always the one with the largest Bellman residual, taken
+    from a priority queue. After a backup only the predecessors of the updated state can change,
+    so only their residuals are recomputed. The run stops when the largest residual is below epsilon.
+
+    Args:
+        states (dict or MDPModel): A dictionary where keys are state names and values are dictionaries
+            with state information, or a model already compiled with `compile_model`.
+        gamma (float): Discount factor for future costs.
+        epsilon (float): Small value for determining convergence of the value function.
+        initial_values (dict or np.ndarray, optional): Warm start from a previous value function.
+            Overrides `random_values`.
+        stats (dict, optional): If given, filled with the number of state backups and residual
+            evaluations.
+        output (str): 'dict' returns dictionaries keyed by state name. 'float64' or 'float32' return a
+            dense value array and int8 action codes wrapped in read-only dictionary views (see
+            `results.solver_output`).
+
+    Returns:
+        V (dict): The value function for each state.
+        policy (dict): The optimal policy for each state.
+        iteration (int): Number of backups expressed in full sweeps (backups / number of states, rounded up).
+    """
+    model = as_model(states)
+    n = model.n_states
+
+    random.seed(seed)
+    if initial_values is not None:
+        V = model.value_array(initial_values)
+    else:
+        V = np.array([random.randint(1, 100) if random_values else 0 for _ in range(n)], dtype=np.float64)
+    V[model.goal] = 0
+
+    # Predecessor lists, and scalar action tables for the one-state backups, built for the states
+    # actually touched so that a warm start near convergence does not pay for the whole model
+    predecessors = successor_graph(model).T.tocsr()
+    pred_ptr, pred_idx = predecessors.indptr.tolist(), predecessors.indices.tolist()
+    actions = dict()
+    goal = model.goal.tolist()
+    values = V.tolist()
+
+    def get_min_action_value(state):
+        """
+        Compute the minimum value of taking any action in a given state.
+        """
+        if state not in actions:
+            actions[state] = model.state_actions(state)
         min_value = float('inf')
-        best_action = None
-        value_per_action = dict()
-        for adj in states[state]['Adj']:
-            for action, prob in adj['A'].items():
-                value = prob * (1 + gamma * V[adj['name']])
-                if not value_per_action.get(action):
-                    value_per_action[action] = value
-                else:
-                    value_per_action[action] += value
-        for action, value in value_per_action.items():
+        for _, cost, succ, probs in actions[state]:
+            value = 0.0
+            for t, p in zip(succ, probs):
+                value += p * values[t]
+            value = cost + gamma * value
             if value < min_value:
                 min_value = value
-                best_action = action
-        return min_value, best_action
+        return min_value
 
-    iteration = 0
-    while True:
-        delta = 0
-        for state in states:
-            # if states[state]['goal'] or states[state]['deadend']:
-            #     V[state] = 0
-            #     policy[state] = 'goal' if states[state]['goal'] else 'deadend'
-            #     continue
-            if states[state]['goal']:
-                V[state] = 0
-                policy[state] = 'goal'
+    # Queue of (-residual, state); entries that no longer match `priority` are stale
+    residuals = np.abs(model.q_values(V, gamma).min(axis=0) - V)
+    residuals[model.goal] = 0
+    priority = residuals.tolist()
+    queue = [(-r, s) for s, r in enumerate(priority) if r >= epsilon]
+    heapq.heapify(queue)
+
+    backups = 0
+    evaluations = n
+    while queue:
+        negative_residual, state = heapq.heappop(queue)
+        if -negative_residual != priority[state]:
+            continue
+        values[state] = get_min_action_value(state)
+        priority[state] = 0.0
+        backups += 1
+        for p in pred_idx[pred_ptr[state]:pred_ptr[state + 1]]:
+            if goal[p]:
                 continue
-            min_value, best_action = get_min_action_value(state)
-            delta = max(delta, abs(min_value - V[state]))
-            V[state] = min_value
-            policy[state] = best_action
+            residual = abs(get_min_action_value(p) - values[p])
+            evaluations += 1
+            if residual != priority[p]:
+                priority[p] = residual
+                if residual >= epsilon:
+                    heapq.heappush(queue, (-residual, p))
 
-        iteration += 1
-        if delta < epsilon:
-            break
+    V = np.array(values)
+    policy = model.q_values(V, gamma).argmin(axis=0)
+    if stats is not None:
+        stats['backups'] = backups
+        stats['residual_evaluations'] = evaluations
 
-    for state in states:
-        if states[state]['deadend']:
-            policy[state] = 'deadend'
+    V, policy = solver_output(model, V, policy, output)
+    return V, policy, -(-backups // n)
 
-    return V, policy, iteration
+def plot_policy(policy, nx, ny, filename = 'policy_plot.png', mode = 'artists'):
+    """
+    Plot a policy on the navigator grid and save it as a PNG image.
+
+    Args:
+        policy (dict): The policy keyed by state name.
+        nx (int): Number of columns.
+        ny (int): Number of rows.
+        filename (str): Path of the PNG image.
+        mode (str): 'artists' draws one text and one arrow per state, 'vector' draws the whole
+            policy as one image layer and one quiver (`rendering.plot_policy_vector`) and 'raster'
+            writes the pixels directly (`rendering.save_policy_raster`).
+    """
+    if mode in ('vector', 'raster'):
+        from rendering import plot_policy_vector, save_policy_raster
+        render = plot_policy_vector if mode == 'vector' else save_policy_raster
+        render(policy, nx, ny, filename)
+        return
+    if mode != 'artists':
+        raise ValueError(f"Unknown plot mode {mode!r}, expected 'artists', 'vector' or 'raster'")
+
+    # pyplot takes hundreds of milliseconds to import, so the solvers do not load it
+    import matplotlib.pyplot as plt
 
-def plot_policy(policy, nx, ny, filename = 'policy_plot.png'):
     # convert values into integers
     policy = {int(key): value for key, value in policy.items()}
     # sort policy
@@ -122,5 +411,7 @@ def plot_policy(policy, nx, ny, filename = 'policy_plot.png'):
             ax.text(x + 0.35, y + 0.55, s = f'{state} : {policy[state]}')
 
         ax.arrow(x + 0.5, y + 0.5, dx, dy, head_width = 0.05, head_length = 0.05, fc='lightcoral', ec = 'lightcoral')
-        
-    plt.savefig(filename)
\ No newline at end of file
+
+    plt.savefig(filename)
+    # close the figure so that memory does not grow across images
+    plt.close(fig)
@@ -0,0 +1,325 @@
+"""Streaming loader that compiles navigator JSON files without building the full object tree"""
+
+import hashlib
+import json
+import os
+import time
+from array import array
+
+import numpy as np
+import scipy.sparse as sp
+
+from mdp_model import MDPModel, build_model
+
+CHUNK_SIZE = 1 << 20
+
+CACHE_SUFFIX = '.mdpcache'
+CACHE_MAGIC = b'MDPCACHE'
+CACHE_VERSION = 2
+# Arrays start on this boundary so that they can be memory-mapped directly
+CACHE_ALIGNMENT = 64
+
+_WHITESPACE = ' \t\n\r'
+
+
+class _Reader:
+    """
+    Incremental reader over a text file that decodes one JSON value at a time.
+
+    Only the unparsed tail of the file is kept in memory, so each state object is decoded on
+    its own and discarded once its transitions have been appended to the model arrays.
+    """
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Skip whitespace and return the next character, or '' at the end of the file."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos} of the JSON stream")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value, reading more of the file until it is available."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof or not self._fill():
+                    raise
+                continue
+            self.pos = end
+            return value
+
+
+def stream_model(file_path, chunk_size=CHUNK_SIZE):
+    """
+    Compile a navigator JSON file into an `MDPModel` while reading it.
+
+    The transitions are appended to compact typed arrays as each state is decoded, so the nested
+    dictionary of `load_json` is never built. State ids follow the order of the keys in the file,
+    as in `compile_model`.
+
+    Args:
+        file_path (str): Path of the JSON file.
+        chunk_size (int): Number of characters read from the file at a time.
+
+    Returns:
+        MDPModel: The compiled model.
+    """
+    # Names get a provisional id when first seen, as a key or as a successor
+    index = dict()
+    actions = []
+    action_index = dict()
+    keys = array('q')
+    goal, deadend, heuristic = array('b'), array('b'), array('d')
+    row_actions, row_states, cols, probs, costs = array('q'), array('q'), array('q'), array('d'), array('d')
+
+    with open(file_path, 'r') as f:
+        reader = _Reader(f, chunk_size)
+        reader.expect('{')
+        while reader.peek() != '}':
+            if keys:
+                reader.expect(',')
+            name = reader.value()
+            reader.expect(':')
+            state = reader.value()
+
+            s = index.setdefault(name, len(index))
+            keys.append(s)
+            goal.append(bool(state['goal']))
+            deadend.append(bool(state['deadend']))
+            heuristic.append(state.get('heuristic', 0))
+            for adj in state['Adj']:
+                successor = index.setdefault(adj['name'], len(index))
+                cost = adj.get('cost', 1)
+                for action, prob in adj['A'].items():
+                    a = action_index.get(action)
+                    if a is None:
+                        a = action_index[action] = len(actions)
+                        actions.append(action)
+                    if state['goal']:
+                        continue
+                    row_actions.append(a)
+                    row_states.append(s)
+                    cols.append(successor)
+                    probs.append(prob)
+                    costs.append(cost)
+        reader.expect('}')
+
+    n = len(keys)
+    if len(index) != n:
+        defined = set(keys)
+        missing = [name for name, s in index.items() if s not in defined]
+        raise ValueError(f"States referenced but not defined in {file_path}: {missing[:10]}")
+
+    # Relabel the provisional ids so that state ids follow the key order
+    keys = np.frombuffer(keys, dtype=np.int64)
+    relabel = np.empty(n, dtype=np.int64)
+    relabel[keys] = np.arange(n)
+    names = [None] * n
+    for name, s in index.items():
+        names[relabel[s]] = name
+
+    rows = np.frombuffer(row_actions, dtype=np.int64) * n + relabel[np.frombuffer(row_states, dtype=np.int64)]
+    cols = relabel[np.frombuffer(cols, dtype=np.int64)]
+    return build_model(names, actions, rows, cols, np.frombuffer(probs, dtype=np.float64),
+                       np.frombuffer(goal, dtype=np.int8).astype(bool),
+                       np.frombuffer(deadend, dtype=np.int8).astype(bool),
+                       np.frombuffer(heuristic, dtype=np.float64).copy(), np.frombuffer(costs, dtype=np.float64))
+
+
+def file_hash(file_path):
+    """Compute the SHA-256 digest of a file."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_path(file_path):
+    """Get the path of the binary cache stored next to a JSON file."""
+    return file_path + CACHE_SUFFIX
+
+
+def save_cache(model, path, source):
+    """
+    Write a compiled model to a binary cache file.
+
+    The file holds a magic string, the length of a JSON header, the header and the raw arrays,
+    each aligned to `CACHE_ALIGNMENT` bytes. The header records the dtype, shape and offset of
+    every array and the identity of the source file. The file is written to a temporary path and
+    renamed, so concurrent readers never see a partial cache.
+
+    Args:
+        model (MDPModel): The compiled model.
+        path (str): Path of the cache file.
+        source (dict): Size, mtime and SHA-256 digest of the source JSON file.
+    """
+    names = np.asarray(model.name_list(), dtype=str)
+    arrays = {'names': names,
+              'data': model.T.data,
+              'indices': model.T.indices,
+              'indptr': model.T.indptr,
+              'C': model.C,
+              'goal': model.goal,
+              'deadend': model.deadend,
+              'heuristic': model.heuristic}
+    if model.costs is not None:
+        arrays['costs'] = model.costs
+
+    layout = dict()
+    offset = 0
+    for key, value in arrays.items():
+        value = np.ascontiguousarray(value)
+        arrays[key] = value
+        layout[key] = {'dtype': value.dtype.str, 'shape': list(value.shape), 'offset': offset}
+        offset += -(-value.nbytes // CACHE_ALIGNMENT) * CACHE_ALIGNMENT
+    header = json.dumps({'version': CACHE_VERSION,
+                         'source': source,
+                         'actions': model.actions,
+                         'shape': list(model.T.shape),
+                         'arrays': layout}).encode()
+    start = -(-(len(CACHE_MAGIC) + 8 + len(header)) // CACHE_ALIGNMENT) * CACHE_ALIGNMENT
+
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(CACHE_MAGIC)
+        f.write(len(header).to_bytes(8, 'little'))
+        f.write(header)
+        for key, value in arrays.items():
+            f.seek(start + layout[key]['offset'])
+            f.write(value.tobytes())
+        f.truncate(start + offset)
+    os.replace(temporary, path)
+
+
+def read_cache_header(path):
+    """
+    Read the header of a binary cache file.
+
+    Returns:
+        tuple: The header dictionary and the offset where the arrays start, or (None, None) if the
+            file is missing or is not a cache of the current version.
+    """
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(CACHE_MAGIC)) != CACHE_MAGIC:
+                return None, None
+            length = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(length))
+    except (OSError, ValueError):
+        return None, None
+    if header.get('version') != CACHE_VERSION:
+        return None, None
+    start = -(-(len(CACHE_MAGIC) + 8 + length) // CACHE_ALIGNMENT) * CACHE_ALIGNMENT
+    return header, start
+
+
+def open_cache(path, header, start):
+    """
+    Memory-map the arrays of a binary cache file into an `MDPModel`.
+
+    The arrays are read-only views of the page cache, shared by every process that opens the
+    same file.
+    """
+    arrays = dict()
+    for key, spec in header['arrays'].items():
+        shape = tuple(spec['shape'])
+        if 0 in shape:
+            arrays[key] = np.zeros(shape, dtype=spec['dtype'])
+        else:
+            arrays[key] = np.memmap(path, dtype=spec['dtype'], mode='r', offset=start + spec['offset'], shape=shape)
+    T = sp.csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']), shape=tuple(header['shape']), copy=False)
+    return MDPModel(arrays['names'], header['actions'], T, arrays['C'],
+                    arrays['goal'], arrays['deadend'], arrays['heuristic'], arrays.get('costs'))
+
+
+def open_cache_file(path):
+    """Memory-map a standalone binary cache file, such as the ones written by `generator.generate`."""
+    header, start = read_cache_header(path)
+    if header is None:
+        raise ValueError(f"{path} is not a model cache of version {CACHE_VERSION}")
+    return open_cache(path, header, start)
+
+
+def load_cached(file_path):
+    """
+    Load a compiled model from the binary cache next to a JSON file, building the cache if needed.
+
+    The cache is keyed by the size, mtime and SHA-256 digest of the JSON file. A matching size and
+    mtime is trusted as is; otherwise the digest decides whether the cache is still valid.
+
+    Args:
+        file_path (str): Path of the JSON file.
+
+    Returns:
+        tuple: The `MDPModel` and True if it came from an existing cache, False if it was compiled.
+    """
+    path = cache_path(file_path)
+    info = os.stat(file_path)
+    header, start = read_cache_header(path)
+    if header is not None:
+        source = header['source']
+        fresh = source['size'] == info.st_size and source['mtime_ns'] == info.st_mtime_ns
+        if fresh or (source['size'] == info.st_size and source['sha256'] == file_hash(file_path)):
+            return open_cache(path, header, start), True
+
+    model = stream_model(file_path)
+    source = {'size': info.st_size, 'mtime_ns': info.st_mtime_ns, 'sha256': file_hash(file_path)}
+    try:
+        save_cache(model, path, source)
+    except OSError:
+        # A read-only directory only costs the cache, not the load
+        return model, False
+    header, start = read_cache_header(path)
+    return open_cache(path, header, start), False
+
+
+def load(file_path, cache=True):
+    """
+    Load a navigator JSON file as a compiled model and measure the load phase.
+
+    Args:
+        file_path (str): Path of the JSON file, or of a standalone `.mdpcache` file.
+        cache (bool): Use the memory-mapped binary cache next to the JSON file (see `load_cached`).
+
+    Returns:
+        tuple: The `MDPModel` and a dictionary with the load time in milliseconds (`load_time_ms`),
+            the size of the model arrays in KB (`model_kb`) and whether the binary cache was
+            warm (`cache_hit`).
+    """
+    start = time.perf_counter()
+    if file_path.endswith(CACHE_SUFFIX):
+        model, cache_hit = open_cache_file(file_path), True
+    elif cache:
+        model, cache_hit = load_cached(file_path)
+    else:
+        model, cache_hit = stream_model(file_path), False
+    load_time_ms = (time.perf_counter() - start) * 1000
+    return model, {'load_time_ms': load_time_ms, 'model_kb': model.nbytes / 10**3, 'cache_hit': cache_hit}
@@ -1,14 +1,20 @@
 """Main file"""
-from utils import load_json
+from utils import load_json, write_csv, RECORD_HEADERS
+from loader import load
+from mdp_model import compile_model
 from iteration_value import value_iteration, plot_policy
 from iteration_policy import policy_iteration
 from iteration_policy_test import policy_iteration as policy_iteration_test
+from results import write_results
 from visualization import bcolors
 
+import inspect
 import time
 import re
 import tracemalloc
-import csv
+
+# Solvers that need the raw dictionary of load_json instead of a compiled model
+DICT_SOLVERS = (policy_iteration_test,)
 
 def extract_dimensions(filename):
     match = re.search(r'navigator(\d+)-(\d+)-\d+-\d+\.json', filename)
@@ -43,27 +49,49 @@ def print_values(V, policy, iterations, sort_values=True):
     print(f"{bcolors.OKCYAN}Converged in {iterations} iterations{bcolors.ENDC}")
 
 
-def run_and_profile(file_path, algorithm,  gamma, epsilon, description, image_generation=False, image_file="", random_values=False):
+def run_and_profile(file_path, algorithm,  gamma, epsilon, description, image_generation=False, image_file="", random_values=False,
+                    results_file=None, **solver_options):
     print(f"{bcolors.BOLD_WARNING}---Resultados {description}{bcolors.ENDC}")
-    initial_time = time.time()
-    states = load_json(file_path)
+    # Load phase, timed separately from the solve
+    if algorithm in DICT_SOLVERS:
+        load_start = time.perf_counter()
+        states = load_json(file_path)
+        load_info = {'load_time_ms': (time.perf_counter() - load_start) * 1000, 'model_kb': ''}
+    else:
+        states, load_info = load(file_path)
 
-    # tracemalloc starts
-    tracemalloc.start()
+    # Collect solver statistics when the algorithm reports them
+    stats = dict()
+    if 'stats' in inspect.signature(algorithm).parameters:
+        solver_options['stats'] = stats
+
+    initial_time = time.perf_counter()
     # Run algorithms
-    V, policy, iterations  = algorithm(states, gamma=gamma, epsilon=epsilon, random_values=random_values)
-    # Get values and stop tracemalloc
+    V, policy, iterations  = algorithm(states, gamma=gamma, epsilon=epsilon, random_values=random_values, **solver_options)
+    final_time = time.perf_counter()
+    tiempo_ejecucion = (final_time - initial_time) * 1000  # Convert to milliseconds
+
+    # Memory is measured in a second run, since tracemalloc slows the solve down
+    tracemalloc.start()
+    algorithm(states, gamma=gamma, epsilon=epsilon, random_values=random_values, **solver_options)
     current, peak = tracemalloc.get_traced_memory()
     tracemalloc.stop()
-       
-    final_time = time.time()
-    tiempo_ejecucion = (final_time - initial_time) * 1000  # Convert to milliseconds
     
     if image_generation==True:
         nx, ny = extract_dimensions(file_path)
         plot_policy(policy = policy, nx = nx, ny = ny, filename = image_file)
 
-    print_values(V, policy, iterations, image_generation)
+    if results_file:
+        # Large maps are written in chunks instead of printed state by state; the writer needs a
+        # compiled model, which the dictionary solvers do not build
+        model = compile_model(states) if algorithm in DICT_SOLVERS else states
+        write_results(results_file, model, V, policy)
+        print(f"{bcolors.OKCYAN}Resultados escritos en {results_file}; converged in {iterations} iterations{bcolors.ENDC}")
+    else:
+        print_values(V, policy, iterations, image_generation)
+    for key, value in stats.items():
+        print(f"{bcolors.OKCYAN}{key}: {value}{bcolors.ENDC}")
+    print(f"{bcolors.RED}Load time: {load_info['load_time_ms']:.2f} milisegundos; Model size: {load_info['model_kb']} KB{bcolors.ENDC}")
     print(f"{bcolors.RED}Convergence time: {tiempo_ejecucion:.2f} milisegundos{bcolors.ENDC}")
     print(f"{bcolors.CYAN}Current memory usage is {current / 10**3} KB; Peak was {peak / 10**3} KB{bcolors.ENDC}\n")
 
@@ -73,6 +101,8 @@ def run_and_profile(file_path, algorithm,  gamma, epsilon, description, image_ge
                "epsilon" : epsilon,
                "random_values" : random_values,
                "iterations": iterations,
+               "load_time_ms": load_info['load_time_ms'],
+               "model_kb": load_info['model_kb'],
                "tiempo_ejecucion": tiempo_ejecucion,
                "memory_current_kb": current / 10**3,
                "memory_peak_kb": peak / 10**3}
@@ -117,16 +147,7 @@ def main():
         data[key] = [record[key] for record in records]
 
     # print result
-    # declare headers
-    headers = {'algorithm': 'Algorithm',
-               'file_path': 'File Path',
-               'gamma': 'Gamma',
-               'epsilon': 'Epsilon',
-               'random_values': 'Valores iniciales random',
-               'iterations': 'Iterations',
-               'tiempo_ejecucion': 'Tiempo Ejecucion (ms)',
-               'memory_current_kb': 'Memory Current (KB)',
-               'memory_peak_kb': 'Memory Peak (KB)'}
+    headers = RECORD_HEADERS
 
     # find max length characters
     max_lengths = [max(len(header_title), max(len(str(data[header][i])) for i in range(len(data[header])))) for header, header_title in headers.items()]
@@ -143,44 +164,11 @@ def main():
     print("-" * (sum(max_lengths) + len(headers) * 3 + 1))
 
     for i in range(len(data['algorithm'])):
-        row = [
-            data['algorithm'][i],
-            data['file_path'][i],
-            data['gamma'][i],
-            data['epsilon'][i],
-            data['random_values'][i],
-            data['iterations'][i],
-            data['tiempo_ejecucion'][i],
-            data['memory_current_kb'][i],
-            data['memory_peak_kb'][i]
-        ]
+        row = [data[header][i] for header in headers]
         print_row(row)
 
-    # store data into a pandas dataframe
-   # Crear el diccionario de mapeo
-    header_mapping = headers.copy()
-
     # Crear un archivo CSV
-    with open('data_output.csv', mode='w', newline='') as file:
-        writer = csv.writer(file)
-
-        # Escribir los encabezados amigables
-        writer.writerow([header_mapping[header] for header in headers])
-
-        # Escribir las filas de datos
-        for i in range(len(data['algorithm'])):
-            row = [
-                data['algorithm'][i],
-                data['file_path'][i],
-                data['gamma'][i],
-                data['epsilon'][i],
-                data['random_values'][i],
-                data['iterations'][i],
-                data['tiempo_ejecucion'][i],
-                data['memory_current_kb'][i],
-                data['memory_peak_kb'][i]
-            ]
-            writer.writerow(row)
+    write_csv(records, 'data_output.csv')
 
     print(f"{bcolors.BOLD_OKGREEN}Archivo CSV creado con éxito: data_output.csv{bcolors.ENDC}")
 
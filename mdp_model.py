@@ -0,0 +1,366 @@
+"""Compiled sparse representation of the navigation MDP"""
+
+import numpy as np
+import scipy.sparse as sp
+
+# Ways to treat dead ends (see `deadend_model`)
+DEADEND_HANDLING = ('legacy', 'penalty', 'absorbing')
+
+
+class MDPModel:
+    """
+    Compact model of an MDP compiled from the dictionary returned by `load_json`.
+
+    States and actions are identified by integer ids. The transitions of every action are
+    stored as CSR row blocks of a single stacked matrix, so a Bellman backup over all
+    actions is one sparse mat-vec product.
+
+    Attributes:
+        names (list or np.ndarray): State names indexed by state id.
+        index (dict): Maps each state name to its state id, built on first use.
+        actions (list): Action names indexed by action id.
+        T (scipy.sparse.csr_matrix): Stacked transition matrix of shape (n_actions * n_states, n_states).
+            Row `a * n_states + s` holds the successor distribution of action `a` in state `s`.
+        C (np.ndarray): Expected immediate cost of each action in each state, shape (n_actions, n_states).
+            Actions that are not available in a state have an infinite cost.
+        costs (np.ndarray): Cost of each stored transition, aligned with `T.data`, or None when every
+            transition has a unit cost. The solvers only read `C`, so weighted maps are backed up
+            exactly like unit-cost maps.
+        goal (np.ndarray): Boolean flag per state, True for goal states.
+        deadend (np.ndarray): Boolean flag per state, True for dead ends.
+        heuristic (np.ndarray): Heuristic value per state (0 when the JSON file has none).
+        label_deadends (bool): Label the dead ends 'deadend' in the policies, as the dictionary
+            solvers do, instead of their greedy action. False after a `deadend_model` that changes
+            their transitions.
+    """
+
+    def __init__(self, names, actions, T, C, goal, deadend, heuristic, costs=None):
+        self.names = names
+        self._index = None
+        self.actions = actions
+        self.T = T
+        self.C = C
+        self.goal = goal
+        self.deadend = deadend
+        self.heuristic = heuristic
+        self.costs = costs
+        self.label_deadends = True
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = {name: i for i, name in enumerate(self.name_list())}
+        return self._index
+
+    @property
+    def n_states(self):
+        return len(self.names)
+
+    @property
+    def n_actions(self):
+        return len(self.actions)
+
+    @property
+    def nbytes(self):
+        """Memory used by the model arrays, in bytes."""
+        arrays = (self.T.data, self.T.indices, self.T.indptr, self.C, self.goal, self.deadend, self.heuristic)
+        return sum(array.nbytes for array in arrays) + (0 if self.costs is None else self.costs.nbytes)
+
+    @property
+    def available(self):
+        """Boolean matrix of shape (n_actions, n_states), True where the action can be taken."""
+        return np.isfinite(self.C)
+
+    def transition_costs(self):
+        """Get the cost of each stored transition, aligned with `T.data`, with ones for unit-cost models."""
+        if self.costs is None:
+            return np.ones(len(self.T.data))
+        return self.costs
+
+    def transition_matrix(self, action):
+        """
+        Get the CSR transition matrix of a single action.
+
+        Args:
+            action (int): The action id.
+
+        Returns:
+            scipy.sparse.csr_matrix: Matrix of shape (n_states, n_states).
+        """
+        n = self.n_states
+        return self.T[action * n:(action + 1) * n]
+
+    def state_actions(self, state):
+        """
+        Get the available actions of a state as plain Python lists, for scalar backup loops.
+
+        Args:
+            state (int): The state id.
+
+        Returns:
+            list: One (action id, cost, successor ids, probabilities) tuple per available action.
+        """
+        n = self.n_states
+        T = self.T
+        actions = []
+        for a in range(self.n_actions):
+            cost = self.C[a, state]
+            if not np.isfinite(cost):
+                continue
+            start, end = T.indptr[a * n + state], T.indptr[a * n + state + 1]
+            actions.append((a, float(cost), T.indices[start:end].tolist(), T.data[start:end].tolist()))
+        return actions
+
+    def policy_matrix(self, policy):
+        """
+        Get the transition matrix and cost vector induced by a policy.
+
+        Args:
+            policy (np.ndarray): Action id chosen in each state.
+
+        Returns:
+            tuple: CSR matrix of shape (n_states, n_states) and cost vector of shape (n_states,).
+        """
+        states = np.arange(self.n_states)
+        return self.T[policy * self.n_states + states], self.C[policy, states]
+
+    def q_values(self, V, gamma):
+        """
+        Compute the action values of every state in one vectorized Bellman backup.
+
+        Args:
+            V (np.ndarray): Current value function.
+            gamma (float): Discount factor for future costs.
+
+        Returns:
+            np.ndarray: Action values of shape (n_actions, n_states).
+        """
+        return self.C + gamma * (self.T @ V).reshape(self.n_actions, self.n_states)
+
+    def name_list(self):
+        """Get the state names as a list of Python strings."""
+        if isinstance(self.names, np.ndarray):
+            return self.names.tolist()
+        return self.names
+
+    def value_array(self, V):
+        """
+        Convert a value function into an array indexed by state id.
+
+        Args:
+            V (dict or np.ndarray): Values keyed by state name, as returned by the solvers,
+                or already indexed by state id.
+
+        Returns:
+            np.ndarray: A new float array of shape (n_states,).
+        """
+        if isinstance(V, np.ndarray):
+            return V.astype(np.float64, copy=True)
+        return np.array([V[name] for name in self.name_list()], dtype=np.float64)
+
+    def policy_array(self, policy, default):
+        """
+        Convert a policy into an array of action ids indexed by state id.
+
+        States whose action is not available in this model, such as the 'goal' and 'deadend'
+        labels, take their action from `default`.
+
+        Args:
+            policy (dict or np.ndarray): Actions keyed by state name, as returned by the solvers,
+                or action ids indexed by state id.
+            default (np.ndarray): Fallback action id of each state.
+
+        Returns:
+            np.ndarray: A new integer array of shape (n_states,).
+        """
+        if isinstance(policy, np.ndarray):
+            result = policy.astype(np.int64, copy=True)
+        else:
+            action_index = {action: a for a, action in enumerate(self.actions)}
+            result = np.array([action_index.get(policy.get(name), -1) for name in self.name_list()], dtype=np.int64)
+        states = np.arange(self.n_states)
+        invalid = (result < 0) | (result >= self.n_actions)
+        invalid[~invalid] = ~self.available[result[~invalid], states[~invalid]]
+        result[invalid] = default[invalid]
+        return result
+
+    def value_dict(self, V):
+        """Convert a value array into a dictionary keyed by state name."""
+        return dict(zip(self.name_list(), V.tolist()))
+
+    def policy_dict(self, policy):
+        """
+        Convert an array of action ids into a dictionary keyed by state name.
+
+        Goal states are labelled 'goal', and dead ends 'deadend' as in the dictionary solvers
+        when `label_deadends` is set.
+        """
+        result = dict()
+        for s, (name, action) in enumerate(zip(self.name_list(), policy.tolist())):
+            if self.deadend[s] and self.label_deadends:
+                result[name] = 'deadend'
+            elif self.goal[s]:
+                result[name] = 'goal'
+            else:
+                result[name] = self.actions[action]
+        return result
+
+
+def compile_model(states):
+    """
+    Compile the dictionary returned by `load_json` into an `MDPModel`.
+
+    Each transition costs the `cost` field of its `Adj` entry, 1 when it has none. Goal states are
+    absorbing with zero cost.
+
+    Args:
+        states (dict): A dictionary where keys are state names and values are dictionaries with state information.
+
+    Returns:
+        MDPModel: The compiled model.
+    """
+    names = list(states)
+    index = {name: i for i, name in enumerate(names)}
+    n = len(names)
+
+    actions = []
+    action_index = dict()
+    rows, cols, probs, costs = [], [], [], []
+    goal = np.zeros(n, dtype=bool)
+    deadend = np.zeros(n, dtype=bool)
+    heuristic = np.zeros(n, dtype=np.float64)
+    for s, name in enumerate(names):
+        state = states[name]
+        goal[s] = state['goal']
+        deadend[s] = state['deadend']
+        heuristic[s] = state.get('heuristic', 0)
+        for adj in state['Adj']:
+            successor = index[adj['name']]
+            cost = adj.get('cost', 1)
+            for action, prob in adj['A'].items():
+                a = action_index.get(action)
+                if a is None:
+                    a = action_index[action] = len(actions)
+                    actions.append(action)
+                if goal[s]:
+                    continue
+                rows.append(a * n + s)
+                cols.append(successor)
+                probs.append(prob)
+                costs.append(cost)
+
+    return build_model(names, actions, rows, cols, probs, goal, deadend, heuristic, costs)
+
+
+def build_model(names, actions, rows, cols, probs, goal, deadend, heuristic, costs=None):
+    """
+    Build an `MDPModel` from transition triplets.
+
+    Args:
+        names (list): State names indexed by state id.
+        actions (list): Action names indexed by action id.
+        rows (array-like): Stacked row `action * n_states + state` of each transition.
+        cols (array-like): Successor state id of each transition.
+        probs (array-like): Probability of each transition.
+        goal (np.ndarray): Boolean goal flag per state.
+        deadend (np.ndarray): Boolean dead end flag per state.
+        heuristic (np.ndarray): Heuristic value per state.
+        costs (array-like, optional): Cost of each transition. None, or all ones, for unit costs.
+
+    Returns:
+        MDPModel: The compiled model.
+    """
+    n, n_actions = len(names), len(actions)
+    rows, cols = np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+    probs = np.asarray(probs, dtype=np.float64)
+    T = sp.csr_matrix((probs, (rows, cols)), shape=(n_actions * n, n))
+    T.sum_duplicates()
+
+    if costs is not None:
+        costs = np.asarray(costs, dtype=np.float64)
+        if np.all(costs == 1):
+            costs = None
+    if costs is None:
+        # With unit costs the expected immediate cost of an action is its total probability mass
+        weighted = T
+    else:
+        # Same coordinates as T, so the same sparsity pattern; duplicate transitions get their
+        # probability-weighted mean cost
+        weighted = sp.csr_matrix((probs * costs, (rows, cols)), shape=(n_actions * n, n))
+        weighted.sum_duplicates()
+        costs = np.divide(weighted.data, T.data, out=np.ones_like(T.data), where=T.data != 0)
+    mass = np.asarray(weighted.sum(axis=1)).reshape(n_actions, n)
+    available = np.diff(T.indptr).reshape(n_actions, n) > 0
+    C = np.where(available, mass, np.inf)
+    C[:, goal] = 0
+
+    return MDPModel(names, actions, T, C, goal, deadend, heuristic, costs)
+
+
+def default_penalty(model):
+    """
+    Get the default dead-end penalty of a model: the number of states times the largest action cost.
+
+    It is more than the cost of any path that visits each state once, so dead ends are avoided
+    whenever a sure path to a goal exists.
+    """
+    finite = model.C[np.isfinite(model.C) & ~model.goal]
+    return model.n_states * float(np.max(finite, initial=1))
+
+
+def deadend_model(model, handling, penalty=None):
+    """
+    Change how the dead ends of a model are treated.
+
+    - 'legacy' keeps the transitions of the file: the navigator dead end loops on itself at a unit
+      cost per step, so its discounted value is 1 / (1 - gamma).
+    - 'absorbing' replaces the transitions of every dead end with a self-loop that costs `penalty`
+      per step, for any action.
+    - 'penalty' makes every dead end terminal with a one-off cost `penalty` (the finite dead-end
+      penalty of fSSPUDE), so that its value is `penalty` for any gamma, including gamma = 1.
+
+    The solvers take the model as it is, so this step comes before them (`cli.py --deadend`). With
+    'absorbing' and 'penalty' the dead ends keep their flag but are labelled with their greedy
+    action in the policies (see `MDPModel.label_deadends`).
+
+    Args:
+        model (MDPModel): The compiled model.
+        handling (str): One of `DEADEND_HANDLING`.
+        penalty (float, optional): Cost per step ('absorbing') or one-off cost ('penalty') of a dead
+            end. Defaults to `default_penalty`.
+
+    Returns:
+        MDPModel: The model itself for 'legacy', otherwise a new model.
+    """
+    if handling not in DEADEND_HANDLING:
+        raise ValueError(f"Unknown dead end handling {handling!r}, expected one of {DEADEND_HANDLING}")
+    if handling == 'legacy':
+        return model
+    if penalty is None:
+        penalty = default_penalty(model)
+    n = model.n_states
+    deadend = np.array(model.deadend, dtype=bool)
+    T = model.T.tocoo()
+    keep = ~deadend[T.row % n]
+    rows, cols = T.row[keep].astype(np.int64), T.col[keep].astype(np.int64)
+    probs, costs = T.data[keep], model.transition_costs()[keep]
+    if handling == 'absorbing':
+        states = np.flatnonzero(deadend)
+        loops = (np.arange(model.n_actions)[:, None] * n + states).ravel()
+        rows = np.concatenate([rows, loops])
+        cols = np.concatenate([cols, np.tile(states, model.n_actions)])
+        probs = np.concatenate([probs, np.ones(len(loops))])
+        costs = np.concatenate([costs, np.full(len(loops), float(penalty))])
+    result = build_model(model.name_list(), list(model.actions), rows, cols, probs, np.array(model.goal, dtype=bool),
+                         deadend, np.array(model.heuristic, dtype=np.float64), costs)
+    if handling == 'penalty':
+        result.C[:, deadend & ~result.goal] = penalty
+    result.label_deadends = False
+    return result
+
+
+def as_model(states):
+    """Return `states` unchanged if it is already an `MDPModel`, otherwise compile it."""
+    if isinstance(states, MDPModel):
+        return states
+    return compile_model(states)
@@ -0,0 +1,205 @@
+"""Multi-core Jacobi sweeps over row blocks of a large model, with the value function in shared memory"""
+
+import multiprocessing as mp
+import os
+from multiprocessing import shared_memory
+from threading import BrokenBarrierError
+
+import numpy as np
+
+from topology import component_rows
+
+# Commands sent to the workers through the control slots
+EXIT, SWEEP, PREPARE, EVALUATE = 0, 1, 2, 3
+
+
+def partition_states(model, blocks, nx=None):
+    """
+    Split the states into contiguous blocks of about the same size.
+
+    With the navigator layout (`nx` columns, state k on grid row (k - 1) // nx), a block is a range of
+    whole grid rows, so that most successors of a block lie in the same block or its neighbours.
+    Otherwise the state ids are split in ranges.
+
+    Args:
+        model (MDPModel): The compiled model.
+        blocks (int): Number of blocks.
+        nx (int, optional): Number of columns of the navigator grid.
+
+    Returns:
+        list: Sorted arrays of state ids, one per non-empty block.
+    """
+    n = model.n_states
+    keys = np.arange(n)
+    if nx is not None:
+        try:
+            keys = np.array([(int(name) - 1) // nx for name in model.name_list()], dtype=np.int64)
+        except ValueError:
+            pass
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    # Move every cut back to the start of the grid row it falls in
+    cuts = [int(np.searchsorted(sorted_keys, sorted_keys[i * n // blocks], 'left')) for i in range(1, blocks)]
+    bounds = sorted(set([0] + cuts + [n]))
+    return [np.sort(order[start:end]) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+
+def _layout(buffer, n, n_blocks):
+    """Views of the shared memory: two value buffers, residual per block, policy and control slots."""
+    values = np.ndarray((2, n), dtype=np.float64, buffer=buffer)
+    residual = np.ndarray((n_blocks,), dtype=np.float64, buffer=buffer, offset=values.nbytes)
+    policy = np.ndarray((n,), dtype=np.int64, buffer=buffer, offset=values.nbytes + residual.nbytes)
+    control = np.ndarray((2,), dtype=np.int64, buffer=buffer, offset=values.nbytes + residual.nbytes + policy.nbytes)
+    return values, residual, policy, control
+
+
+def _worker(b, name, n, n_blocks, S, T_b, C_b, gamma, barrier):
+    """Run the sweeps of block `b` on the shared value buffers until told to exit."""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        values, residual, policy, control = _layout(shm.buf, n, n_blocks)
+        n_actions, size = C_b.shape
+        local = np.arange(size)
+        P_b = c_b = None
+        while True:
+            barrier.wait()
+            command, parity = int(control[0]), int(control[1])
+            if command == EXIT:
+                break
+            source, target = values[parity], values[1 - parity]
+            if command == PREPARE:
+                # Fix the rows of the policy for the evaluation sweeps that follow
+                actions = policy[S]
+                P_b = T_b[actions * size + local]
+                c_b = C_b[actions, local]
+                barrier.wait()
+                continue
+            if command == SWEEP:
+                new_V = (C_b + gamma * (T_b @ source).reshape(n_actions, size)).min(axis=0)
+            else:
+                new_V = c_b + gamma * (P_b @ source)
+            residual[b] = np.max(np.abs(new_V - source[S]), initial=0)
+            target[S] = new_V
+            barrier.wait()
+        del values, residual, policy, control
+    except BrokenBarrierError:
+        pass
+    finally:
+        shm.close()
+
+
+class ParallelEngine:
+    """
+    Pool of worker processes that run Jacobi sweeps on row blocks of a model.
+
+    Each worker keeps the stacked transition rows and costs of its block, and all of them read and
+    write the value function in shared memory. A sweep reads one value buffer and writes the other,
+    so every block sees the values of the previous sweep, exactly as a vectorized Jacobi sweep over
+    the whole model: the values, residuals and sweep counts are identical to `value_iteration`.
+    Boundary values are exchanged through the shared buffers, with a barrier between sweeps.
+
+    Use it as a context manager so that the workers and the shared memory are released.
+
+    Attributes:
+        values (np.ndarray): Value function after the last sweep.
+        previous (np.ndarray): Value function before the last sweep.
+    """
+
+    def __init__(self, model, gamma, workers=None, nx=None):
+        """
+        Args:
+            model (MDPModel): The compiled model.
+            gamma (float): Discount factor for future costs.
+            workers (int, optional): Number of worker processes. Defaults to the number of CPUs.
+            nx (int, optional): Number of columns of the navigator grid, to partition by grid rows.
+        """
+        n = model.n_states
+        self.blocks = partition_states(model, workers or os.cpu_count() or 1, nx)
+        n_blocks = len(self.blocks)
+        size = 2 * n * 8 + n_blocks * 8 + n * 8 + 2 * 8
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self._values, self._residual, self._policy, self._control = _layout(self._shm.buf, n, n_blocks)
+        self._values[:] = 0
+        self._parity = 0
+        self._barrier = mp.Barrier(n_blocks + 1)
+        self._processes = []
+        try:
+            for b, S in enumerate(self.blocks):
+                process = mp.Process(target=_worker, daemon=True,
+                                     args=(b, self._shm.name, n, n_blocks, S, model.T[component_rows(model, S)],
+                                           model.C[:, S], gamma, self._barrier))
+                process.start()
+                self._processes.append(process)
+        except BaseException:
+            self.close()
+            raise
+
+    @property
+    def values(self):
+        return self._values[self._parity]
+
+    @property
+    def previous(self):
+        return self._values[1 - self._parity]
+
+    def load_values(self, V):
+        """Set the value function the next sweep starts from."""
+        self._values[self._parity] = V
+
+    def _run(self, command):
+        self._control[0] = command
+        self._control[1] = self._parity
+        self._barrier.wait()
+        self._barrier.wait()
+
+    def sweep(self):
+        """
+        Run one Bellman backup sweep over all the states.
+
+        Returns:
+            float: The largest change of a value.
+        """
+        self._run(SWEEP)
+        self._parity = 1 - self._parity
+        return float(self._residual.max())
+
+    def set_policy(self, policy):
+        """Fix the policy evaluated by `evaluation_sweep`."""
+        self._policy[:] = policy
+        self._run(PREPARE)
+
+    def evaluation_sweep(self):
+        """
+        Run one policy evaluation sweep over all the states with the policy of `set_policy`.
+
+        Returns:
+            float: The largest change of a value.
+        """
+        self._run(EVALUATE)
+        self._parity = 1 - self._parity
+        return float(self._residual.max())
+
+    def close(self):
+        """Stop the workers and release the shared memory."""
+        if self._processes:
+            self._control[0] = EXIT
+            try:
+                self._barrier.wait(timeout=10)
+            except BrokenBarrierError:
+                pass
+            for process in self._processes:
+                process.join(timeout=10)
+                if process.is_alive():
+                    process.terminate()
+            self._processes = []
+        if self._shm is not None:
+            del self._values, self._residual, self._policy, self._control
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,178 @@
+"""Fast policy rendering for large grids"""
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Arrow direction of each action, as in plot_policy
+DIRECTIONS = {'N': (0, 1), 'S': (0, -1), 'E': (1, 0), 'W': (-1, 0)}
+
+# Cell codes of the policy grid
+EMPTY, GOAL, DEADEND = 0, 1, 2
+ACTION_CODES = {action: 3 + i for i, action in enumerate(DIRECTIONS)}
+OTHER = 3 + len(DIRECTIONS)
+
+# RGB color of each cell code
+CELL_COLORS = np.array([[255, 255, 255],   # empty
+                        [144, 238, 144],   # goal
+                        [169, 169, 169],   # deadend
+                        [255, 245, 238], [255, 245, 238], [255, 245, 238], [255, 245, 238],
+                        [230, 230, 250]],  # any other action
+                       dtype=np.uint8)
+ARROW_COLOR = np.array([240, 128, 128], dtype=np.uint8)  # lightcoral
+GRID_COLOR = np.array([0, 0, 0], dtype=np.uint8)
+
+
+def policy_grid(policy, nx, ny):
+    """
+    Lay a policy out on the navigator grid.
+
+    State k (counting from 1) sits in column (k - 1) % nx and row (k - 1) // nx from the top, as in
+    `plot_policy`; states past nx * ny (the dead end) fall in an extra bottom row.
+
+    Args:
+        policy (dict): The policy keyed by state name.
+        nx (int): Number of columns.
+        ny (int): Number of rows.
+
+    Returns:
+        np.ndarray: Cell codes of shape (ny + 1, nx).
+    """
+    grid = np.full((ny + 1, nx), EMPTY, dtype=np.int8)
+    states = np.fromiter((int(state) for state in policy), dtype=np.int64, count=len(policy))
+    codes = np.fromiter((GOAL if action == 'goal' else DEADEND if action == 'deadend' else
+                         ACTION_CODES.get(action, OTHER) for action in policy.values()),
+                        dtype=np.int8, count=len(policy))
+    rows, cols = (states - 1) // nx, (states - 1) % nx
+    inside = (rows >= 0) & (rows <= ny)
+    grid[rows[inside], cols[inside]] = codes[inside]
+    return grid
+
+
+def _arrow_stamps(cell):
+    """Build a (n_codes, cell, cell, 3) array with the picture of one cell for every code."""
+    stamps = np.empty((len(CELL_COLORS), cell, cell, 3), dtype=np.uint8)
+    stamps[:] = CELL_COLORS[:, None, None, :]
+    center = cell // 2
+    half = max(1, int(cell * 0.3))
+    width = max(1, cell // 16)
+    for action, code in ACTION_CODES.items():
+        dx, dy = DIRECTIONS[action]
+        for step in range(half + 1):
+            x, y = center + dx * step, center - dy * step
+            stamps[code, max(0, y - width + 1):y + width, max(0, x - width + 1):x + width] = ARROW_COLOR
+        # Arrow head
+        tip_x, tip_y = center + dx * half, center - dy * half
+        for offset in range(1, max(2, cell // 8) + 1):
+            for side in (-1, 1):
+                x = tip_x - dx * offset + dy * offset * side
+                y = tip_y + dy * offset + dx * offset * side
+                if 0 <= x < cell and 0 <= y < cell:
+                    stamps[code, y, x] = ARROW_COLOR
+    stamps[:, 0, :] = GRID_COLOR
+    stamps[:, :, 0] = GRID_COLOR
+    return stamps
+
+
+def rasterize_policy(policy, nx, ny, cell=16):
+    """
+    Rasterize a policy straight into an RGB image, without any matplotlib artist.
+
+    Every cell is a precomputed stamp (background color and arrow) picked by its code, so the cost
+    is a single gather over the grid.
+
+    Args:
+        policy (dict): The policy keyed by state name.
+        nx (int): Number of columns.
+        ny (int): Number of rows.
+        cell (int): Size of a cell in pixels.
+
+    Returns:
+        np.ndarray: Image of shape ((ny + 1) * cell, nx * cell, 3) and dtype uint8.
+    """
+    grid = policy_grid(policy, nx, ny)
+    image = _arrow_stamps(cell)[grid]
+    return image.transpose(0, 2, 1, 3, 4).reshape((ny + 1) * cell, nx * cell, 3)
+
+
+def save_policy_raster(policy, nx, ny, filename='policy_plot.png', cell=16):
+    """Rasterize a policy with `rasterize_policy` and write it as a PNG image."""
+    import matplotlib.image
+
+    matplotlib.image.imsave(filename, rasterize_policy(policy, nx, ny, cell))
+
+
+def plot_policy_vector(policy, nx, ny, filename='policy_plot.png', labels=None, figsize=(12, 12)):
+    """
+    Draw a policy with vectorized matplotlib collections: one image layer and one quiver.
+
+    Args:
+        policy (dict): The policy keyed by state name.
+        nx (int): Number of columns.
+        ny (int): Number of rows.
+        filename (str): Path of the PNG image.
+        labels (bool, optional): Write 'state : action' in every cell as `plot_policy` does.
+            Defaults to True only for grids of at most 400 cells.
+        figsize (tuple): Size of the figure in inches.
+    """
+    from matplotlib.figure import Figure
+
+    grid = policy_grid(policy, nx, ny)
+    # A standalone Figure is not registered with pyplot, so nothing is kept after saving
+    fig = Figure(figsize=figsize)
+    ax = fig.subplots()
+    ax.imshow(CELL_COLORS[grid], extent=(0, nx, 0, ny + 1), interpolation='nearest', aspect='auto')
+    ax.set_xticks(np.arange(nx + 1))
+    ax.set_yticks(np.arange(ny + 2))
+    ax.grid(True, color='black', lw=0.3)
+    ax.tick_params(left=False, bottom=False, labelleft=False, labelbottom=False)
+
+    rows, cols = np.nonzero(grid >= ACTION_CODES['N'])
+    directions = np.array(list(DIRECTIONS.values()) + [(0, 0)], dtype=np.float64)
+    U, V = directions[grid[rows, cols] - ACTION_CODES['N']].T
+    ax.quiver(cols + 0.5, ny - rows + 0.5, U, V, color='lightcoral', angles='xy',
+              scale_units='xy', scale=1 / 0.35, width=0.004)
+
+    if labels is None:
+        labels = nx * (ny + 1) <= 400
+    if labels:
+        for state, action in policy.items():
+            x = (int(state) - 1) % nx
+            y = ny - (int(state) - 1) // nx
+            ax.text(x + 0.35, y + 0.55, s=f'{state} : {action}')
+
+    fig.savefig(filename)
+
+
+def _render(job):
+    policy, nx, ny, filename, mode = job
+    if mode == 'raster':
+        save_policy_raster(policy, nx, ny, filename)
+    else:
+        plot_policy_vector(policy, nx, ny, filename)
+    return filename
+
+
+def render_policies(jobs, mode='vector', workers=None):
+    """
+    Render many policies to PNG files on a process pool.
+
+    Figures are not registered with pyplot and are dropped as soon as they are written, so memory
+    stays flat however many images are rendered.
+
+    Args:
+        jobs (list): (policy, nx, ny, filename) tuples.
+        mode (str): 'vector' for `plot_policy_vector` or 'raster' for `save_policy_raster`.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs;
+            1 renders in this process.
+
+    Returns:
+        list: The filenames written.
+    """
+    if mode not in ('vector', 'raster'):
+        raise ValueError(f"Unknown rendering mode {mode!r}, expected 'vector' or 'raster'")
+    jobs = [(policy, nx, ny, filename, mode) for policy, nx, ny, filename in jobs]
+    if workers == 1:
+        return [_render(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_render, jobs))
@@ -0,0 +1,198 @@
+"""Compact solver outputs and a streaming result writer"""
+
+import csv
+import os
+from collections.abc import Mapping
+
+import numpy as np
+
+# Formats of the value function and policy returned by the solvers
+OUTPUT_FORMATS = ('dict', 'float64', 'float32')
+
+# Policy codes of goal states and dead ends; other codes are action ids
+GOAL_CODE = -1
+DEADEND_CODE = -2
+
+CHUNK_ROWS = 1 << 16
+
+
+class ValueView(Mapping):
+    """
+    Read-only dictionary view of a value array, keyed by state name.
+
+    Values are looked up in the array on access, so no per-state objects are created until used.
+
+    Attributes:
+        array (np.ndarray): Value per state id.
+    """
+
+    def __init__(self, model, array):
+        self.model = model
+        self.array = array
+
+    def __getitem__(self, name):
+        return float(self.array[self.model.index[name]])
+
+    def __iter__(self):
+        return iter(self.model.name_list())
+
+    def __len__(self):
+        return len(self.array)
+
+    def __repr__(self):
+        return f'ValueView({len(self)} states, dtype={self.array.dtype})'
+
+
+class PolicyView(Mapping):
+    """
+    Read-only dictionary view of int8 policy codes, keyed by state name, with the same labels as
+    the dictionary policies ('goal', 'deadend' or the action name).
+
+    Attributes:
+        codes (np.ndarray): Action id per state id, `GOAL_CODE` for goal states and `DEADEND_CODE`
+            for dead ends.
+    """
+
+    def __init__(self, model, codes):
+        self.model = model
+        self.codes = codes
+
+    def label(self, code):
+        if code == DEADEND_CODE:
+            return 'deadend'
+        if code == GOAL_CODE:
+            return 'goal'
+        return self.model.actions[code]
+
+    def __getitem__(self, name):
+        return self.label(int(self.codes[self.model.index[name]]))
+
+    def __iter__(self):
+        return iter(self.model.name_list())
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __repr__(self):
+        return f'PolicyView({len(self)} states)'
+
+
+def policy_codes(model, policy):
+    """
+    Encode a policy as int8 codes indexed by state id.
+
+    Args:
+        model (MDPModel): The compiled model.
+        policy (np.ndarray or dict): Action ids indexed by state id, or a policy keyed by state name.
+
+    Returns:
+        np.ndarray: Codes of dtype int8 (see `PolicyView`).
+    """
+    if isinstance(policy, PolicyView):
+        return policy.codes
+    if model.n_actions > np.iinfo(np.int8).max:
+        raise ValueError(f"int8 policy codes support at most 127 actions, the model has {model.n_actions}")
+    if isinstance(policy, Mapping):
+        policy = model.policy_array(policy, np.zeros(model.n_states, dtype=np.int64))
+    codes = np.asarray(policy).astype(np.int8)
+    codes[model.goal] = GOAL_CODE
+    if model.label_deadends:
+        codes[model.deadend] = DEADEND_CODE
+    return codes
+
+
+def value_values(model, V, dtype=np.float64):
+    """Get a value function as an array indexed by state id, from an array, a `ValueView` or a dict."""
+    if isinstance(V, ValueView):
+        return V.array
+    if isinstance(V, Mapping):
+        return model.value_array(V).astype(dtype, copy=False)
+    return np.asarray(V, dtype=dtype)
+
+
+def solver_output(model, V, policy, output='dict'):
+    """
+    Package the value array and action ids found by a solver in the requested output format.
+
+    Args:
+        model (MDPModel): The compiled model.
+        V (np.ndarray): Value per state id.
+        policy (np.ndarray): Action id per state id.
+        output (str): 'dict' for dictionaries keyed by state name, or 'float64' / 'float32' for a
+            `ValueView` over a dense array of that dtype and a `PolicyView` over int8 codes.
+
+    Returns:
+        tuple: The value function and the policy.
+    """
+    if output not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {output!r}, expected one of {OUTPUT_FORMATS}")
+    if output == 'dict':
+        return model.value_dict(V), model.policy_dict(policy)
+    return ValueView(model, np.asarray(V, dtype=output)), PolicyView(model, policy_codes(model, policy))
+
+
+def write_results(file_path, model, V, policy, chunk_rows=CHUNK_ROWS):
+    """
+    Write a value function and policy to a file, a chunk of states at a time.
+
+    The format follows the extension:
+
+    - `.csv`: state, value and action label per row.
+    - `.npy`: structured array with `state`, `value` and `action` (int8 code) fields, written
+      through a memory map.
+    - `.parquet`: `state`, `value` and `action` (int8 code) columns, one row group per chunk, with
+      the action names in the schema metadata. Needs `pyarrow`.
+
+    Args:
+        file_path (str): Path of the output file.
+        model (MDPModel): The compiled model.
+        V (ValueView, dict or np.ndarray): The value function.
+        policy (PolicyView, dict or np.ndarray): The policy.
+        chunk_rows (int): Number of states written at a time.
+    """
+    values = value_values(model, V)
+    codes = policy_codes(model, policy)
+    names = np.asarray(model.names, dtype=str)
+    n = len(values)
+    extension = os.path.splitext(file_path)[1].lower()
+
+    if extension == '.csv':
+        # Codes -2 and -1 land on the labels 'deadend' and 'goal'
+        labels = np.array(['deadend', 'goal'] + list(model.actions), dtype=object)
+        with open(file_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['state', 'value', 'action'])
+            for start in range(0, n, chunk_rows):
+                end = min(start + chunk_rows, n)
+                writer.writerows(zip(names[start:end].tolist(), values[start:end].tolist(),
+                                     labels[codes[start:end].astype(np.int64) + 2].tolist()))
+        return
+
+    if extension == '.npy':
+        dtype = np.dtype([('state', names.dtype), ('value', values.dtype), ('action', np.int8)])
+        out = np.lib.format.open_memmap(file_path, mode='w+', dtype=dtype, shape=(n,))
+        for start in range(0, n, chunk_rows):
+            end = min(start + chunk_rows, n)
+            out['state'][start:end] = names[start:end]
+            out['value'][start:end] = values[start:end]
+            out['action'][start:end] = codes[start:end]
+        out.flush()
+        del out
+        return
+
+    if extension == '.parquet':
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as error:
+            raise ImportError("Writing Parquet files needs pyarrow") from error
+        schema = pa.schema([('state', pa.string()), ('value', pa.from_numpy_dtype(values.dtype)), ('action', pa.int8())],
+                           metadata={'actions': ','.join(model.actions)})
+        with pq.ParquetWriter(file_path, schema) as writer:
+            for start in range(0, n, chunk_rows):
+                end = min(start + chunk_rows, n)
+                writer.write_table(pa.table([pa.array(names[start:end]), pa.array(values[start:end]),
+                                             pa.array(codes[start:end])], schema=schema))
+        return
+
+    raise ValueError(f"Unknown result format {extension!r}, expected '.csv', '.npy' or '.parquet'")
@@ -0,0 +1,392 @@
+"""Long-running solver service with a model cache and incremental re-solves of map patches"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict, defaultdict, deque
+
+import numpy as np
+
+from iteration_value import prioritized_value_iteration, value_iteration
+from loader import load
+from mdp_model import build_model
+
+DEFAULT_CACHE_BYTES = 256 * 10**6
+# Number of latencies kept per operation for the percentiles
+LATENCY_WINDOW = 10000
+# Longest request or response line
+LINE_LIMIT = 1 << 26
+
+
+def apply_patch(model, edits):
+    """
+    Apply map edits to a compiled model.
+
+    The model is never modified: cached models are memory-mapped read-only, so the patched model is
+    built from copies of its arrays. Each edit names a state and one change:
+
+    - `{"state": "12", "deadend": true}` turns the state into an absorbing dead end.
+    - `{"state": "5", "slip": 0.3}` sets the probability of slipping into a dead end for every action
+      of the state that can slip into one, scaling its other transitions to the remaining
+      probability. Actions without a dead-end successor are left unchanged.
+    - `{"state": "5", "Adj": [...]}` replaces the transitions of the state with `Adj` entries in the
+      JSON format.
+
+    Args:
+        model (MDPModel): The compiled model.
+        edits (list): The edits, applied in order.
+
+    Returns:
+        MDPModel: The patched model.
+
+    Raises:
+        ValueError: If the edits are malformed or name unknown states or actions.
+    """
+    if not isinstance(edits, list) or not all(isinstance(edit, dict) for edit in edits):
+        raise ValueError("Patch edits must be a list of JSON objects")
+    n = model.n_states
+    action_index = {action: a for a, action in enumerate(model.actions)}
+    T = model.T.tocoo()
+    rows, cols, probs = T.row.astype(np.int64), T.col.astype(np.int64), T.data.astype(np.float64)
+    costs = np.array(model.transition_costs(), dtype=np.float64)
+    goal = np.array(model.goal, dtype=bool)
+    deadend = np.array(model.deadend, dtype=bool)
+    heuristic = np.array(model.heuristic, dtype=np.float64)
+
+    for edit in edits:
+        if edit.get('state') not in model.index:
+            raise ValueError(f"Unknown state in patch: {edit.get('state')!r}")
+        s = model.index[edit['state']]
+        mask = rows % n == s
+        if edit.get('deadend'):
+            new_rows = np.arange(model.n_actions) * n + s
+            new_cols = np.full(model.n_actions, s)
+            new_probs = np.ones(model.n_actions)
+            new_costs = np.ones(model.n_actions)
+            goal[s], deadend[s] = False, True
+        elif 'slip' in edit:
+            slip = float(edit['slip'])
+            if not 0 <= slip <= 1:
+                raise ValueError(f"Slip probability must be between 0 and 1, got {slip}")
+            new_rows, new_cols, new_probs, new_costs = rows[mask], cols[mask], probs[mask].copy(), costs[mask]
+            into_deadend = deadend[new_cols]
+            if not into_deadend.any():
+                raise ValueError(f"State {edit['state']!r} has no transitions into a dead end")
+            for row in np.unique(new_rows[into_deadend]):
+                in_row = new_rows == row
+                slipping = in_row & into_deadend
+                staying = in_row & ~into_deadend
+                new_probs[slipping] = slip / slipping.sum()
+                mass = new_probs[staying].sum()
+                if mass > 0:
+                    new_probs[staying] *= (1 - slip) / mass
+        elif 'Adj' in edit:
+            new_rows, new_cols, new_probs, new_costs = [], [], [], []
+            if not isinstance(edit['Adj'], list) or not all(isinstance(adj, dict) and isinstance(adj.get('A'), dict)
+                                                            for adj in edit['Adj']):
+                raise ValueError("'Adj' must be a list of JSON objects with an 'A' object, as in the map files")
+            for adj in edit['Adj']:
+                if adj['name'] not in model.index:
+                    raise ValueError(f"Unknown state in patch: {adj['name']!r}")
+                for action, prob in adj['A'].items():
+                    if action not in action_index:
+                        raise ValueError(f"Unknown action in patch: {action!r}")
+                    new_rows.append(action_index[action] * n + s)
+                    new_cols.append(model.index[adj['name']])
+                    new_probs.append(prob)
+                    new_costs.append(adj.get('cost', 1))
+            goal[s] = False
+        else:
+            raise ValueError(f"Patch edits need 'deadend', 'slip' or 'Adj': {edit}")
+        rows = np.concatenate([rows[~mask], np.asarray(new_rows, dtype=np.int64)])
+        cols = np.concatenate([cols[~mask], np.asarray(new_cols, dtype=np.int64)])
+        probs = np.concatenate([probs[~mask], np.asarray(new_probs, dtype=np.float64)])
+        costs = np.concatenate([costs[~mask], np.asarray(new_costs, dtype=np.float64)])
+
+    return build_model(model.name_list(), list(model.actions), rows, cols, probs, goal, deadend, heuristic, costs)
+
+
+def patch_id(base, edits):
+    """Identify a patched map by its base map and a digest of the edits."""
+    digest = hashlib.sha256(json.dumps(edits, sort_keys=True).encode()).hexdigest()[:16]
+    return f'{base}+{digest}'
+
+
+class _Entry:
+    """A cached model and its converged solutions, keyed by (gamma, epsilon)."""
+
+    __slots__ = ('model', 'solutions')
+
+    def __init__(self, model):
+        self.model = model
+        self.solutions = dict()
+
+    @property
+    def nbytes(self):
+        return self.model.nbytes + sum(V.nbytes + policy.nbytes for V, policy, _ in self.solutions.values())
+
+
+class ModelCache:
+    """
+    Least recently used cache of compiled models and their solutions, bounded by their size in bytes.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def nbytes(self):
+        return sum(entry.nbytes for entry in self.entries.values())
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        self.shrink(keep=key)
+
+    def shrink(self, keep=None):
+        """Evict the least recently used entries until the cache fits, always keeping `keep`."""
+        total = self.nbytes
+        for key in list(self.entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self.entries.pop(key).nbytes
+            self.evictions += 1
+
+
+class SolverService:
+    """
+    Solve navigation maps on request, keeping models and solutions in a `ModelCache`.
+
+    Requests and responses are JSON objects, one per line. Operations:
+
+    - `{"op": "solve", "map": path, "gamma": 0.9, "epsilon": 1e-6}` returns the policy of a JSON file
+      or of a patched map, solving it only if no cached solution exists. `"values": true` also
+      returns the value function.
+    - `{"op": "patch", "map": base, "edits": [...], ...}` applies `apply_patch` edits to a map and
+      solves the result with prioritized sweeping, warm-started from the solution of the base map,
+      so only the states affected by the edits are backed up. The response names the new map, which
+      can be solved or patched again.
+    - `{"op": "stats"}` returns the p50 and p99 latency of every operation and the cache counters.
+
+    Solves and patches need gamma in (0, 1) and a positive epsilon. Every response has `ok`,
+    `latency_ms` and, on failure, `error`.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES, solver_options=None):
+        self.cache = ModelCache(max_bytes)
+        self.solver_options = dict(solver_options or {})
+        # Base map and edits of every patched map, so that evicted patches can be rebuilt
+        self.patches = dict()
+        self.latencies = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+        self.lock = asyncio.Lock()
+
+    def entry(self, map_id):
+        """Get the cache entry of a map, loading or rebuilding it if needed."""
+        entry = self.cache.get(map_id)
+        if entry is not None:
+            return entry
+        if map_id in self.patches:
+            base, edits = self.patches[map_id]
+            entry = _Entry(apply_patch(self.entry(base).model, edits))
+        elif os.path.exists(map_id):
+            entry = _Entry(load(map_id)[0])
+        else:
+            raise ValueError(f"Unknown map {map_id!r}")
+        self.cache.put(map_id, entry)
+        return entry
+
+    def solution(self, map_id, gamma, epsilon):
+        """
+        Get the solution of a map, solving it from scratch if it is not cached.
+
+        Returns:
+            tuple: The cache entry, the solution and True if it was cached.
+        """
+        entry = self.entry(map_id)
+        key = (gamma, epsilon)
+        if key in entry.solutions:
+            return entry, entry.solutions[key], True
+        V, policy, iterations = value_iteration(entry.model, gamma=gamma, epsilon=epsilon, **self.solver_options)
+        self.store(map_id, entry, key, V, policy, iterations)
+        return entry, entry.solutions[key], False
+
+    def store(self, map_id, entry, key, V, policy, iterations):
+        model = entry.model
+        entry.solutions[key] = (model.value_array(V), model.policy_array(policy, np.zeros(model.n_states, dtype=np.int64)),
+                                iterations)
+        self.cache.shrink(keep=map_id)
+
+    def respond(self, map_id, entry, solution, message):
+        V, policy, iterations = solution
+        response = {'map': map_id, 'iterations': iterations, 'policy': entry.model.policy_dict(policy)}
+        if message.get('values'):
+            response['values'] = entry.model.value_dict(V)
+        return response
+
+    def dispatch(self, message):
+        """Run a solve or patch request and build its response."""
+        op = message.get('op')
+        gamma = float(message.get('gamma', 0.9))
+        epsilon = float(message.get('epsilon', 1e-6))
+        # Checked before solving, since a solve that never converges would hold the lock forever
+        if not 0 < gamma < 1:
+            raise ValueError(f"gamma must be in (0, 1), got {gamma}")
+        if not epsilon > 0:
+            raise ValueError(f"epsilon must be positive, got {epsilon}")
+        if op == 'solve':
+            map_id = message['map']
+            entry, solution, cached = self.solution(map_id, gamma, epsilon)
+            return dict(self.respond(map_id, entry, solution, message), cached=cached)
+
+        if op == 'patch':
+            base = message['map']
+            edits = message['edits']
+            map_id = patch_id(base, edits)
+            entry = self.cache.get(map_id)
+            if entry is not None and (gamma, epsilon) in entry.solutions:
+                return dict(self.respond(map_id, entry, entry.solutions[(gamma, epsilon)], message), cached=True)
+
+            base_entry, (base_V, _, _), _ = self.solution(base, gamma, epsilon)
+            if entry is None:
+                entry = _Entry(apply_patch(base_entry.model, edits))
+                self.patches[map_id] = (base, edits)
+                self.cache.put(map_id, entry)
+            # New dead ends only loop on themselves, so their value is known in closed form
+            initial_values = base_V.copy()
+            if gamma < 1:
+                for edit in edits:
+                    if edit.get('deadend'):
+                        s = entry.model.index[edit['state']]
+                        initial_values[s] = np.min(entry.model.C[:, s]) / (1 - gamma)
+            stats = dict()
+            V, policy, iterations = prioritized_value_iteration(entry.model, gamma=gamma, epsilon=epsilon,
+                                                                initial_values=initial_values, stats=stats)
+            self.store(map_id, entry, (gamma, epsilon), V, policy, iterations)
+            response = self.respond(map_id, entry, entry.solutions[(gamma, epsilon)], message)
+            return dict(response, cached=False, backups=stats['backups'])
+
+        raise ValueError(f"Unknown operation {op!r}, expected 'solve', 'patch' or 'stats'")
+
+    def stats(self):
+        latency = dict()
+        for op, samples in self.latencies.items():
+            samples_ms = np.asarray(samples, dtype=np.float64) / 10**6
+            p50, p99 = np.percentile(samples_ms, [50, 99])
+            latency[op] = {'count': len(samples), 'p50_ms': float(p50), 'p99_ms': float(p99)}
+        return {'latency': latency,
+                'cache': {'entries': len(self.cache.entries),
+                          'bytes': self.cache.nbytes,
+                          'max_bytes': self.cache.max_bytes,
+                          'hits': self.cache.hits,
+                          'misses': self.cache.misses,
+                          'evictions': self.cache.evictions}}
+
+    async def handle(self, reader, writer):
+        """Serve the requests of one connection, one JSON object per line."""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                start = time.perf_counter_ns()
+                op = None
+                try:
+                    message = json.loads(line)
+                    if not isinstance(message, dict):
+                        raise ValueError("Requests must be JSON objects")
+                    op = message.get('op')
+                    if op == 'stats':
+                        response = self.stats()
+                    else:
+                        # Solves run on a worker thread, one at a time, so the cache is never shared
+                        async with self.lock:
+                            response = await loop.run_in_executor(None, self.dispatch, message)
+                    response['ok'] = True
+                except (ValueError, KeyError, TypeError, OSError) as error:
+                    response = {'ok': False, 'error': str(error)}
+                elapsed = time.perf_counter_ns() - start
+                self.latencies[op if isinstance(op, str) else 'invalid'].append(elapsed)
+                response['latency_ms'] = elapsed / 10**6
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, path=None, host='127.0.0.1', port=8765):
+        """Serve forever on a Unix socket if `path` is given, otherwise on TCP `host:port`."""
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle, path=path, limit=LINE_LIMIT)
+        else:
+            server = await asyncio.start_server(self.handle, host, port, limit=LINE_LIMIT)
+        async with server:
+            await server.serve_forever()
+
+
+async def send(messages, path=None, host='127.0.0.1', port=8765):
+    """
+    Send requests to a running service over one connection.
+
+    Args:
+        messages (list): Request dictionaries.
+        path (str, optional): Unix socket of the service. Defaults to TCP `host:port`.
+
+    Returns:
+        list: The responses, in order.
+    """
+    if path is not None:
+        reader, writer = await asyncio.open_unix_connection(path, limit=LINE_LIMIT)
+    else:
+        reader, writer = await asyncio.open_connection(host, port, limit=LINE_LIMIT)
+    responses = []
+    try:
+        for message in messages:
+            writer.write(json.dumps(message).encode() + b'\n')
+            await writer.drain()
+            responses.append(json.loads(await reader.readline()))
+    finally:
+        writer.close()
+        await writer.wait_closed()
+    return responses
+
+
+def request(message, path=None, host='127.0.0.1', port=8765):
+    """Send one request to a running service and return its response."""
+    return asyncio.run(send([message], path, host, port))[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve navigation policies from a model cache")
+    parser.add_argument('--socket', help="Unix socket path; defaults to TCP on localhost")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--cache-mb', type=float, default=DEFAULT_CACHE_BYTES / 10**6)
+    parser.add_argument('--topological', action='store_true', help="Solve new maps with topological value iteration")
+    args = parser.parse_args()
+
+    service = SolverService(int(args.cache_mb * 10**6), {'topological': args.topological})
+    where = args.socket or f'{args.host}:{args.port}'
+    print(f"Solver service listening on {where}")
+    asyncio.run(service.serve(args.socket, args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
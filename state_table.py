@@ -0,0 +1,104 @@
+"""Pure-Python action tables of the navigation MDP, for deployments without NumPy"""
+
+
+class StateTable:
+    """
+    Flat action tables of an MDP, built once so that solver loops only index into lists.
+
+    The available actions of state `s` occupy the slots `action_ptr[s]:action_ptr[s + 1]`, in
+    increasing action id. Slot `k` holds action `action_ids[k]` with expected cost `costs[k]`, and
+    its transitions occupy `succ_ptr[k]:succ_ptr[k + 1]` of the parallel lists `succ` and `probs`.
+    Plain lists are used rather than `array.array`, since reading a list returns the stored objects
+    without boxing a new number on every access.
+
+    Goal states have no slots: they are absorbing with zero cost.
+    """
+
+    __slots__ = ('names', 'actions', 'goal', 'deadend', 'action_ptr', 'action_ids', 'costs',
+                 'succ_ptr', 'succ', 'probs')
+
+    def __init__(self, names, actions, goal, deadend, action_ptr, action_ids, costs, succ_ptr, succ, probs):
+        self.names = names
+        self.actions = actions
+        self.goal = goal
+        self.deadend = deadend
+        self.action_ptr = action_ptr
+        self.action_ids = action_ids
+        self.costs = costs
+        self.succ_ptr = succ_ptr
+        self.succ = succ
+        self.probs = probs
+
+    @property
+    def n_states(self):
+        return len(self.names)
+
+    def state_slots(self, state):
+        """Get the slot range of the actions of a state."""
+        return range(self.action_ptr[state], self.action_ptr[state + 1])
+
+
+def build_state_table(states):
+    """
+    Build a `StateTable` from the dictionary returned by `load_json`.
+
+    State and action ids follow the same order as `compile_model`: states in key order and actions
+    in order of first appearance. Each transition costs the `cost` field of its `Adj` entry, 1 when
+    it has none, and the expected cost of an action is the probability-weighted sum.
+
+    Args:
+        states (dict): A dictionary where keys are state names and values are dictionaries with state information.
+
+    Returns:
+        StateTable: The action tables.
+    """
+    names = list(states)
+    index = {name: i for i, name in enumerate(names)}
+    actions = []
+    action_index = dict()
+    goal = [bool(states[name]['goal']) for name in names]
+    deadend = [bool(states[name]['deadend']) for name in names]
+
+    action_ptr, action_ids, costs = [0], [], []
+    succ_ptr, succ, probs = [0], [], []
+    for s, name in enumerate(names):
+        # Group the Adj entries of the state by action
+        transitions = dict()
+        for adj in states[name]['Adj']:
+            for action, prob in adj['A'].items():
+                a = action_index.get(action)
+                if a is None:
+                    a = action_index[action] = len(actions)
+                    actions.append(action)
+                transitions.setdefault(a, []).append((index[adj['name']], prob, adj.get('cost', 1)))
+        if not goal[s]:
+            for a in sorted(transitions):
+                action_ids.append(a)
+                costs.append(float(sum(prob * cost for _, prob, cost in transitions[a])))
+                for t, prob, _ in transitions[a]:
+                    succ.append(t)
+                    probs.append(float(prob))
+                succ_ptr.append(len(succ))
+        action_ptr.append(len(action_ids))
+
+    return StateTable(names, actions, goal, deadend, action_ptr, action_ids, costs, succ_ptr, succ, probs)
+
+
+def table_from_model(model):
+    """Build a `StateTable` from a compiled `MDPModel`."""
+    action_ptr, action_ids, costs = [0], [], []
+    succ_ptr, succ, probs = [0], [], []
+    goal = model.goal.tolist()
+    for s in range(model.n_states):
+        if not goal[s]:
+            for a, cost, successors, probabilities in model.state_actions(s):
+                action_ids.append(a)
+                costs.append(cost)
+                succ.extend(successors)
+                probs.extend(probabilities)
+                succ_ptr.append(len(succ))
+        action_ptr.append(len(action_ids))
+    # Dead ends that are not labelled keep their greedy action in the policies
+    deadend = model.deadend.tolist() if model.label_deadends else [False] * model.n_states
+    return StateTable(model.name_list(), list(model.actions), goal, deadend,
+                      action_ptr, action_ids, costs, succ_ptr, succ, probs)
@@ -0,0 +1,245 @@
+"""Parallel parameter sweeps over navigator instances"""
+
+import argparse
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmark import measure_memory
+from heuristic_search import lao_star, lrtdp
+from iteration_policy import policy_iteration
+from iteration_value import value_iteration
+from loader import load
+from utils import write_csv, RECORD_HEADERS
+
+# Solvers available to the sweeps, by name so that cases can be sent to worker processes
+SOLVERS = {'value_iteration': value_iteration,
+           'policy_iteration': policy_iteration,
+           'lao_star': lao_star,
+           'lrtdp': lrtdp}
+
+# Solvers that support random initial values
+RANDOM_INIT_SOLVERS = ('value_iteration', 'policy_iteration')
+
+# Solvers that can be seeded with a previous value function and policy
+WARM_START_SOLVERS = ('value_iteration', 'policy_iteration')
+
+# Sweep records also tell where a warm-started run took its seed from
+SWEEP_HEADERS = dict(RECORD_HEADERS, warm_start='Warm Start')
+
+# Instances loaded by this process, so that each worker loads a file only once
+_instances = dict()
+
+
+def build_grid(files, algorithms, gammas, epsilons, random_values=(False,), options=None):
+    """
+    Build the cartesian product of sweep parameters.
+
+    Args:
+        files (list): Paths of the JSON files.
+        algorithms (list): Solver names, keys of `SOLVERS`.
+        gammas (list): Discount factors.
+        epsilons (list): Convergence thresholds.
+        random_values (list): Initial value settings. Random initial values are skipped for the
+            solvers that do not support them.
+        options (dict, optional): Extra keyword arguments passed to every solver call.
+
+    Returns:
+        list: One case dictionary per combination.
+    """
+    for algorithm in algorithms:
+        if algorithm not in SOLVERS:
+            raise ValueError(f"Unknown algorithm {algorithm!r}, expected one of {list(SOLVERS)}")
+    return [{'file_path': file_path,
+             'algorithm': algorithm,
+             'gamma': gamma,
+             'epsilon': epsilon,
+             'random_values': random,
+             'options': dict(options or {})}
+            for file_path, algorithm, gamma, epsilon, random
+            in itertools.product(files, algorithms, gammas, epsilons, random_values)
+            if not random or algorithm in RANDOM_INIT_SOLVERS]
+
+
+def get_instance(file_path):
+    """
+    Get the compiled model of a file, loading it on first use in this process.
+
+    Returns:
+        tuple: The `MDPModel` and the load information of `loader.load`. The load time is 0 when
+            the model was already loaded by this process.
+    """
+    if file_path in _instances:
+        model, load_info = _instances[file_path]
+        return model, dict(load_info, load_time_ms=0.0)
+    _instances[file_path] = load(file_path)
+    return _instances[file_path]
+
+
+def solve_case(case, warm_start=None):
+    """
+    Solve one sweep case and measure it.
+
+    A worker process runs a single case at a time, so the time and memory of concurrent cases never
+    mix. The memory is measured in a second, untimed run of the solver, since tracing the
+    allocations slows the solve down.
+
+    Args:
+        case (dict): A case built by `build_grid`.
+        warm_start (tuple, optional): Case, value function and policy of a finished run to seed
+            the solver with.
+
+    Returns:
+        tuple: A record with the same keys as the records of `run_and_profile`, plus the solver stats
+            and the warm start source, and the value function and policy found.
+    """
+    model, load_info = get_instance(case['file_path'])
+    algorithm = SOLVERS[case['algorithm']]
+    stats = dict()
+    options = dict(case['options'])
+    if case['random_values']:
+        options['random_values'] = True
+    source = ''
+    if warm_start is not None:
+        seed_case, V, policy = warm_start
+        source = f"gamma={seed_case['gamma']} epsilon={seed_case['epsilon']}"
+        options['initial_values'] = V
+        if case['algorithm'] == 'policy_iteration':
+            options['initial_policy'] = policy
+
+    initial_time = time.perf_counter()
+    V, policy, iterations = algorithm(model, gamma=case['gamma'], epsilon=case['epsilon'], stats=stats, **options)
+    tiempo_ejecucion = (time.perf_counter() - initial_time) * 1000
+    memory = measure_memory(lambda: algorithm(model, gamma=case['gamma'], epsilon=case['epsilon'], **options))
+
+    record = {'algorithm': case['algorithm'],
+              'file_path': case['file_path'],
+              'gamma': case['gamma'],
+              'epsilon': case['epsilon'],
+              'random_values': case['random_values'],
+              'iterations': iterations,
+              'load_time_ms': load_info['load_time_ms'],
+              'model_kb': load_info['model_kb'],
+              'tiempo_ejecucion': tiempo_ejecucion,
+              'memory_current_kb': memory['memory_current_kb'],
+              'memory_peak_kb': memory['memory_peak_kb'],
+              'warm_start': source,
+              'stats': stats,
+              'worker': os.getpid()}
+    return record, V, policy
+
+
+def run_case(case):
+    """
+    Solve one sweep case from scratch and measure it (see `solve_case`).
+
+    Returns:
+        dict: The record of the run.
+    """
+    return solve_case(case)[0]
+
+
+def warm_start_chains(cases):
+    """
+    Group the cases into chains in which every case warm-starts from the previous one.
+
+    Cases that share file, algorithm and options are ordered by increasing gamma and decreasing
+    epsilon, so each run starts from the closest finished run: the same gamma with a looser epsilon,
+    or else the next lower gamma, whose values are a lower bound of the new ones. Cases with random
+    initial values or with solvers that cannot be seeded form chains of their own.
+
+    Args:
+        cases (list): Cases built by `build_grid`.
+
+    Returns:
+        list: Lists of cases.
+    """
+    chains = dict()
+    singles = []
+    for case in cases:
+        if case['random_values'] or case['algorithm'] not in WARM_START_SOLVERS:
+            singles.append([case])
+            continue
+        key = (case['file_path'], case['algorithm'], repr(sorted(case['options'].items())))
+        chains.setdefault(key, []).append(case)
+    for chain in chains.values():
+        chain.sort(key=lambda case: (case['gamma'], -case['epsilon']))
+    return list(chains.values()) + singles
+
+
+def run_chain(chain, compare_cold=False):
+    """
+    Run a chain of cases, seeding each one with the result of the previous one.
+
+    Args:
+        chain (list): Cases built by `warm_start_chains`.
+        compare_cold (bool): Also run every warm-started case from scratch, to measure the savings.
+
+    Returns:
+        list: The records of the runs.
+    """
+    records = []
+    warm_start = None
+    for case in chain:
+        if warm_start is not None and compare_cold:
+            records.append(run_case(case))
+        record, V, policy = solve_case(case, warm_start)
+        records.append(record)
+        warm_start = (case, V, policy)
+    return records
+
+
+def run_sweep(cases, workers=None, warm_start=False, compare_cold=False):
+    """
+    Run sweep cases on a process pool.
+
+    Args:
+        cases (list): Cases built by `build_grid`.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs;
+            1 runs the cases in this process.
+        warm_start (bool): Run the cases as warm-start chains (see `warm_start_chains`), one chain
+            per task.
+        compare_cold (bool): In warm-start mode, also run every warm-started case from scratch.
+
+    Returns:
+        list: The records of the runs, in the order of `cases`, or chain by chain in warm-start mode.
+    """
+    if warm_start:
+        chains = warm_start_chains(cases)
+        if workers == 1:
+            results = [run_chain(chain, compare_cold) for chain in chains]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(run_chain, chains, [compare_cold] * len(chains)))
+        return [record for records in results for record in records]
+
+    if workers == 1:
+        return [run_case(case) for case in cases]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run_case, cases))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a parameter sweep over navigator instances")
+    parser.add_argument('files', nargs='+', help="JSON files to solve")
+    parser.add_argument('--algorithms', nargs='+', default=['value_iteration', 'policy_iteration'], choices=list(SOLVERS))
+    parser.add_argument('--gammas', nargs='+', type=float, default=[0.1, 0.9, 0.99])
+    parser.add_argument('--epsilons', nargs='+', type=float, default=[1e-2, 1e-6])
+    parser.add_argument('--random-values', action='store_true', help="Also run every case with random initial values")
+    parser.add_argument('--warm-start', action='store_true', help="Seed each run with the closest finished run")
+    parser.add_argument('--compare-cold', action='store_true', help="With --warm-start, also run every case from scratch")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default='sweep_output.csv')
+    args = parser.parse_args(argv)
+
+    random_values = (False, True) if args.random_values else (False,)
+    cases = build_grid(args.files, args.algorithms, args.gammas, args.epsilons, random_values)
+    start = time.perf_counter()
+    records = run_sweep(cases, args.workers, args.warm_start, args.compare_cold)
+    write_csv(records, args.output, SWEEP_HEADERS)
+    print(f"{len(records)} cases in {time.perf_counter() - start:.2f} s, written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
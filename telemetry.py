@@ -0,0 +1,134 @@
+"""Per-iteration telemetry and budgets for the solvers"""
+
+import csv
+import json
+import time
+
+# Columns of the iteration records, in the order of the CSV sink
+TRACE_FIELDS = ('solver', 'iteration', 'residual', 'changed_actions', 'backups', 'elapsed_ns', 'iteration_ns',
+                'inner_sweeps', 'component')
+
+
+class JSONLSink:
+    """Write iteration records to a file, one JSON object per line."""
+
+    def __init__(self, file_path):
+        self.file = open(file_path, 'w')
+
+    def write(self, record):
+        self.file.write(json.dumps(record) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class CSVSink:
+    """Write iteration records to a CSV file with the columns of `TRACE_FIELDS`."""
+
+    def __init__(self, file_path):
+        self.file = open(file_path, 'w', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=TRACE_FIELDS, restval='', extrasaction='ignore')
+        self.writer.writeheader()
+
+    def write(self, record):
+        self.writer.writerow(record)
+
+    def close(self):
+        self.file.close()
+
+
+class Tracer:
+    """
+    Collect per-iteration records from a solver and enforce time and backup budgets.
+
+    A solver calls `start` once and `record` after every iteration. Each record holds the
+    iteration number, the Bellman residual, the number of states whose greedy action changed,
+    the cumulative number of state backups and the elapsed time in nanoseconds, and is passed to
+    every sink and to the callback. Solvers that get no tracer skip all of this.
+
+    Attributes:
+        stop_reason (str): 'time_budget' or 'backup_budget' once a budget ran out, otherwise None.
+        records (list): The records of the run, when `keep` is True.
+    """
+
+    def __init__(self, sinks=(), callback=None, time_budget_ms=None, max_backups=None, keep=False):
+        """
+        Args:
+            sinks (list): Objects with a `write(record)` method, such as `JSONLSink` or `CSVSink`.
+            callback (callable, optional): Called with every record.
+            time_budget_ms (float, optional): Stop the solver once this much time has passed.
+            max_backups (int, optional): Stop the solver once it has done this many state backups.
+            keep (bool): Keep the records in `records`.
+        """
+        self.sinks = list(sinks)
+        self.callback = callback
+        self.time_budget_ns = None if time_budget_ms is None else int(time_budget_ms * 10**6)
+        self.max_backups = max_backups
+        self.keep = keep
+        self.records = []
+        self.solver = None
+        self.stop_reason = None
+        self._start = self._last = 0
+
+    def start(self, solver):
+        """Start the clock for a run of `solver`."""
+        self.solver = solver
+        self.stop_reason = None
+        self._start = self._last = time.perf_counter_ns()
+
+    def over_budget(self, backups):
+        """
+        Check the budgets, e.g. between the inner sweeps of an iteration.
+
+        Returns:
+            bool: True if a budget ran out, in which case the solver should return its current result.
+        """
+        if self.time_budget_ns is not None and time.perf_counter_ns() - self._start >= self.time_budget_ns:
+            self.stop_reason = 'time_budget'
+        elif self.max_backups is not None and backups >= self.max_backups:
+            self.stop_reason = 'backup_budget'
+        return self.stop_reason is not None
+
+    def record(self, iteration, residual, changed_actions, backups, **extra):
+        """
+        Emit the record of a finished iteration and check the budgets.
+
+        Args:
+            iteration (int): Iteration number, counting from 1.
+            residual (float): Largest change of the value function in this iteration.
+            changed_actions (int): Number of states whose greedy action changed.
+            backups (int): Total number of state backups so far.
+            **extra: Solver specific fields, such as `inner_sweeps` or `component`.
+
+        Returns:
+            bool: True if a budget ran out.
+        """
+        now = time.perf_counter_ns()
+        record = {'solver': self.solver,
+                  'iteration': iteration,
+                  'residual': float(residual),
+                  'changed_actions': int(changed_actions),
+                  'backups': int(backups),
+                  'elapsed_ns': now - self._start,
+                  'iteration_ns': now - self._last}
+        record.update(extra)
+        self._last = now
+        for sink in self.sinks:
+            sink.write(record)
+        if self.callback is not None:
+            self.callback(record)
+        if self.keep:
+            self.records.append(record)
+        return self.over_budget(backups)
+
+    def close(self):
+        """Close the sinks that can be closed."""
+        for sink in self.sinks:
+            if hasattr(sink, 'close'):
+                sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from mdp_model import compile_model  # noqa: E402
+from utils import load_json  # noqa: E402
+
+MAPS = ('navigator3-15-0-0.json', 'navigator4-10-0-0.json')
+
+
+def map_path(name):
+    return os.path.join(ROOT, 'json_files', name)
+
+
+@pytest.fixture(params=MAPS)
+def states(request):
+    """The states of a bundled navigator map, as returned by `load_json`."""
+    return load_json(map_path(request.param))
+
+
+@pytest.fixture
+def model(states):
+    return compile_model(states)
@@ -0,0 +1,25 @@
+import pytest
+
+from batch import solve_batch
+from conftest import MAPS, map_path
+from iteration_value import value_iteration
+from utils import load_json
+
+
+@pytest.mark.parametrize('gamma', [0.9, 0.99])
+def test_matches_value_iteration(gamma):
+    instances = [load_json(map_path(name)) for name in MAPS + ('test.json',)]
+    stats = dict()
+    results = solve_batch(instances, gamma=gamma, epsilon=1e-8, stats=stats)
+    assert stats['instances'] == len(instances)
+    for states, (V, policy, iterations) in zip(instances, results):
+        V_base, policy_base, iterations_base = value_iteration(states, gamma=gamma, epsilon=1e-8)
+        assert max(abs(V[s] - V_base[s]) for s in V_base) < 1e-9
+        assert dict(policy) == dict(policy_base)
+        assert iterations == iterations_base
+
+
+def test_empty_batch():
+    stats = dict()
+    assert solve_batch([], stats=stats) == []
+    assert stats['instances'] == 0 and stats['sweeps'] == 0
@@ -0,0 +1,53 @@
+import pytest
+
+from benchmark import compare, record_key, run_benchmark, summarize, time_runs
+from conftest import map_path
+
+
+def test_summarize():
+    summary = summarize([4 * 10**6, 1 * 10**6, 3 * 10**6, 2 * 10**6, 5 * 10**6])
+    assert summary == {'median_ms': 3.0, 'iqr_ms': 2.0, 'min_ms': 1.0, 'max_ms': 5.0, 'repeats': 5}
+
+
+def test_time_runs():
+    calls = []
+    samples, result = time_runs(lambda: calls.append(None) or len(calls), warmup=2, repeats=3)
+    assert len(samples) == 3 and all(sample >= 0 for sample in samples)
+    assert len(calls) == 5 and result == 5
+
+
+def test_compare():
+    def record(instance, phase, median_ms, algorithm=None, gamma=None):
+        return {'instance': instance, 'phase': phase, 'algorithm': algorithm, 'gamma': gamma,
+                'median_ms': median_ms}
+
+    baseline = {'records': [record('a', 'load', 4.0),
+                            record('a', 'solve', 10.0, 'value_iteration', 0.9),
+                            record('a', 'solve', 8.0, 'value_iteration', 0.99),
+                            record('b', 'load', 1.0)]}
+    results = {'records': [record('a', 'load', 2.0),
+                           record('a', 'solve', 20.0, 'value_iteration', 0.9),
+                           record('a', 'solve', 0.0, 'value_iteration', 0.99),
+                           record('c', 'load', 1.0)]}
+    rows = compare(baseline, results)
+    assert rows == [(('a', 'load', None, None), 4.0, 2.0, 2.0),
+                    (('a', 'solve', 'value_iteration', 0.9), 10.0, 20.0, 0.5),
+                    (('a', 'solve', 'value_iteration', 0.99), 8.0, 0.0, float('inf'))]
+
+
+def test_run_benchmark():
+    path = map_path('navigator3-15-0-0.json')
+    results = run_benchmark(files=[path], sizes=(), algorithms=['value_iteration'], gammas=[0.9],
+                            warmup=0, repeats=2)
+    records = results['records']
+    assert [record_key(record) for record in records] == [(path, 'load', None, None),
+                                                          (path, 'solve', 'value_iteration', 0.9)]
+    assert all(record['repeats'] == 2 and record['n_states'] == 46 for record in records)
+    assert records[1]['iterations'] > 0
+    # A run compared with itself keeps every record
+    assert [row[0] for row in compare(results, results)] == [record_key(record) for record in records]
+
+
+def test_run_benchmark_rejects_unknown_algorithm():
+    with pytest.raises(ValueError, match='Unknown algorithm'):
+        run_benchmark(sizes=(), algorithms=['simplex'])
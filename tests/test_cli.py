@@ -0,0 +1,35 @@
+import pytest
+
+import cli
+from conftest import map_path
+from iteration_value import value_iteration
+from mdp_model import compile_model
+from utils import load_json
+
+
+def solve_lines(capsys, *arguments):
+    cli.main(['solve', map_path('navigator3-15-0-0.json'), *arguments])
+    out, err = capsys.readouterr()
+    return [line.split('\t') for line in out.splitlines()], err
+
+
+def test_solve_prints_the_value_iteration_solution(capsys):
+    lines, err = solve_lines(capsys, '--gamma', '0.9')
+    V, policy, iterations = value_iteration(load_json(map_path('navigator3-15-0-0.json')), gamma=0.9)
+    assert {state: action for state, action, _ in lines} == policy
+    assert all(abs(float(value) - V[state]) < 1e-5 for state, _, value in lines)
+    assert err.startswith(f'value_iteration: {iterations} iterations')
+
+
+def test_penalty_defaults_to_the_ssp_rule(capsys):
+    model = compile_model(load_json(map_path('navigator3-15-0-0.json')))
+    lines, _ = solve_lines(capsys, '--deadend', 'penalty')
+    values = {state: float(value) for state, _, value in lines}
+    deadend = model.name_list()[model.deadend.argmax()]
+    assert values[deadend] == model.n_states
+
+
+def test_unsupported_option(capsys):
+    with pytest.raises(SystemExit):
+        cli.main(['solve', map_path('navigator3-15-0-0.json'), '--algorithm', 'lrtdp', '--scheme', 'sor'])
+    assert 'does not support scheme' in capsys.readouterr().err
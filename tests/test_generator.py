@@ -0,0 +1,35 @@
+import numpy as np
+
+from generator import generate, navigator_model
+from loader import load, stream_model
+from test_loader import assert_same_model
+
+
+def test_model_matches_the_written_json(tmp_path):
+    path = generate(7, 5, directory=str(tmp_path), binary=False)
+    assert_same_model(stream_model(path), navigator_model(7, 5))
+
+
+def test_generated_cache_is_warm(tmp_path):
+    path = generate(7, 5, directory=str(tmp_path))
+    model, info = load(path)
+    assert info['cache_hit']
+    assert_same_model(stream_model(path), model)
+
+
+def test_binary_only(tmp_path):
+    path = generate(7, 5, directory=str(tmp_path), json_file=False)
+    assert path.endswith('.mdpcache')
+    model, info = load(path)
+    assert info['cache_hit']
+    assert_same_model(navigator_model(7, 5), model)
+
+
+def test_layout():
+    model = navigator_model(7, 5)
+    assert model.n_states == 7 * 5 + 1
+    assert np.flatnonzero(model.goal).tolist() == [model.index[str(7 * 5)]]
+    assert np.flatnonzero(model.deadend).tolist() == [model.index[str(7 * 5 + 1)]]
+    # Every available action of a non-goal state has a full distribution
+    rows = (model.available & ~model.goal).ravel()
+    assert np.allclose(np.asarray(model.T.sum(axis=1)).ravel()[rows], 1)
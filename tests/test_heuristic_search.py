@@ -0,0 +1,35 @@
+import pytest
+
+from heuristic_search import lao_star, lrtdp
+from iteration_value import value_iteration
+from mdp_model import deadend_model
+
+
+@pytest.mark.parametrize('solver', [lao_star, lrtdp])
+def test_initial_state_matches_value_iteration(model, solver):
+    V, _, _ = value_iteration(model, gamma=0.9, epsilon=1e-10)
+    V_search, policy, _ = solver(model, gamma=0.9, epsilon=1e-8)
+    start = model.name_list()[0]
+    assert abs(V_search[start] - V[start]) < 1e-6
+    assert set(policy) == set(V_search)
+
+
+@pytest.mark.parametrize('solver', [lao_star, lrtdp])
+@pytest.mark.parametrize('gamma', [0.0, 1.0, 1.5])
+def test_rejects_undiscounted_gamma(model, solver, gamma):
+    with pytest.raises(ValueError):
+        solver(model, gamma=gamma)
+
+
+@pytest.mark.parametrize('solver', [lao_star, lrtdp])
+@pytest.mark.parametrize('handling', ['penalty', 'absorbing'])
+def test_changed_dead_ends(model, solver, handling):
+    changed = deadend_model(model, handling, 20.0)
+    V, _, _ = value_iteration(changed, gamma=0.9, epsilon=1e-10)
+    V_search, policy, _ = solver(changed, gamma=0.9, epsilon=1e-8)
+    start = model.name_list()[0]
+    assert abs(V_search[start] - V[start]) < 1e-6
+    deadend = model.name_list()[model.deadend.argmax()]
+    if deadend in V_search:
+        assert V_search[deadend] == pytest.approx(V[deadend])
+        assert policy[deadend] in model.actions
@@ -0,0 +1,36 @@
+import pytest
+
+from generator import navigator_model
+from iteration_policy import policy_iteration
+from iteration_value import value_iteration
+from telemetry import Tracer
+
+
+@pytest.mark.parametrize('evaluation', ['iterative', 'exact', 'modified'])
+@pytest.mark.parametrize('topological', [False, True])
+def test_matches_value_iteration(model, evaluation, topological):
+    V, policy, _ = value_iteration(model, gamma=0.9, epsilon=1e-10)
+    V_pi, policy_pi, _ = policy_iteration(model, gamma=0.9, epsilon=1e-10, evaluation=evaluation,
+                                          topological=topological)
+    assert max(abs(V[s] - V_pi[s]) for s in V) < 1e-7
+    assert policy_pi == policy
+
+
+@pytest.mark.parametrize('evaluation', ['iterative', 'modified'])
+def test_python_backend_matches_numpy(states, evaluation):
+    V, policy, iterations = policy_iteration(states, gamma=0.9, evaluation=evaluation, backend='numpy')
+    V_py, policy_py, iterations_py = policy_iteration(states, gamma=0.9, evaluation=evaluation, backend='python')
+    assert iterations_py == iterations
+    assert policy_py == policy
+    assert max(abs(V[s] - V_py[s]) for s in V) < 1e-9
+
+
+def test_exact_evaluation_terminates_on_round_off_ties():
+    # Round-off of the sparse solve used to flip one tied state between two actions forever
+    model = navigator_model(100, 100, (0.2, 0.8))
+    stats = dict()
+    _, _, iterations = policy_iteration(model, gamma=0.9, evaluation='exact', stats=stats,
+                                        tracer=Tracer(time_budget_ms=60000), output='float64')
+    assert stats['stop_reason'] is None
+    _, _, iterations_iterative = policy_iteration(model, gamma=0.9, output='float64')
+    assert iterations == iterations_iterative
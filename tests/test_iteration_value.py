@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from iteration_value import prioritized_value_iteration, value_iteration
+
+
+def assert_same_solution(baseline, result, tolerance=1e-7):
+    V, policy, _ = baseline
+    V_new, policy_new, _ = result
+    assert max(abs(V[s] - V_new[s]) for s in V) < tolerance
+    assert dict(policy_new) == policy
+
+
+@pytest.mark.parametrize('gamma', [0.9, 0.99])
+def test_topological_matches_jacobi(model, gamma):
+    stats = dict()
+    baseline = value_iteration(model, gamma=gamma, epsilon=1e-10)
+    assert_same_solution(baseline, value_iteration(model, gamma=gamma, epsilon=1e-10, topological=True, stats=stats))
+    # The dead end cannot reach the goal and has a closed-form value
+    assert stats['pruned_states'] == 1
+
+
+@pytest.mark.parametrize('gamma', [0.9, 0.99])
+def test_prioritized_matches_jacobi(model, gamma):
+    stats = dict()
+    baseline = value_iteration(model, gamma=gamma, epsilon=1e-10)
+    assert_same_solution(baseline, prioritized_value_iteration(model, gamma=gamma, epsilon=1e-10, stats=stats))
+    assert stats['backups'] > 0
+
+
+def test_prioritized_warm_start_at_the_solution(model):
+    V, policy, _ = value_iteration(model, gamma=0.9, epsilon=1e-12)
+    stats = dict()
+    assert_same_solution((V, policy, 0), prioritized_value_iteration(model, gamma=0.9, epsilon=1e-6,
+                                                                     initial_values=V, stats=stats))
+    # Every residual is already below epsilon, so nothing needs a backup
+    assert stats['backups'] == 0
+
+
+@pytest.mark.parametrize('ordering', ['distance', 'heuristic', 'index'])
+@pytest.mark.parametrize('scheme, omega', [('gauss-seidel', 1.0), ('sor', 1.05)])
+@pytest.mark.parametrize('topological', [False, True])
+def test_in_place_schemes_match_jacobi(model, ordering, scheme, omega, topological):
+    baseline = value_iteration(model, gamma=0.9, epsilon=1e-10)
+    result = value_iteration(model, gamma=0.9, epsilon=1e-10, scheme=scheme, omega=omega, ordering=ordering,
+                             topological=topological)
+    assert_same_solution(baseline, result)
+    # Solving the self-loops exactly and reusing new values takes fewer sweeps than Jacobi
+    assert result[2] < baseline[2]
+
+
+@pytest.mark.parametrize('omega, ordering', [(1.5, 'distance'), (1.2, 'index')])
+def test_sor_rejects_diverging_relaxation(model, omega, ordering):
+    with pytest.raises(ValueError):
+        value_iteration(model, gamma=0.99, scheme='sor', omega=omega, ordering=ordering)
+
+
+def test_in_place_sweeps_raise_on_non_finite_values(model):
+    initial_values = np.zeros(model.n_states)
+    initial_values[~model.goal] = np.inf
+    with pytest.raises(ValueError, match='diverged'), np.errstate(invalid='ignore'):
+        value_iteration(model, gamma=0.9, scheme='gauss-seidel', initial_values=initial_values)
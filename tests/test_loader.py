@@ -0,0 +1,74 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from conftest import MAPS, map_path
+from loader import cache_path, load, stream_model
+from mdp_model import compile_model
+from utils import load_json
+
+
+def assert_same_model(expected, model):
+    assert model.name_list() == expected.name_list()
+    assert list(model.actions) == list(expected.actions)
+    assert (model.T != expected.T).nnz == 0
+    np.testing.assert_array_equal(model.C, expected.C)
+    np.testing.assert_array_equal(model.goal, expected.goal)
+    np.testing.assert_array_equal(model.deadend, expected.deadend)
+    np.testing.assert_array_equal(model.heuristic, expected.heuristic)
+    np.testing.assert_array_equal(model.transition_costs(), expected.transition_costs())
+
+
+@pytest.fixture(params=MAPS + ('test.json',))
+def json_copy(request, tmp_path):
+    path = str(tmp_path / request.param)
+    shutil.copy(map_path(request.param), path)
+    return path
+
+
+def test_stream_model_matches_compile_model(json_copy):
+    assert_same_model(compile_model(load_json(json_copy)), stream_model(json_copy))
+
+
+def test_second_load_hits_the_cache(json_copy):
+    model, info = load(json_copy)
+    assert not info['cache_hit']
+    assert os.path.exists(cache_path(json_copy))
+    cached, info = load(json_copy)
+    assert info['cache_hit']
+    assert_same_model(model, cached)
+    # Costs survive the round trip of the weighted map
+    if model.costs is not None:
+        np.testing.assert_array_equal(cached.costs, model.costs)
+
+
+def test_modified_file_invalidates_the_cache(json_copy):
+    load(json_copy)
+    states = load_json(json_copy)
+    name = next(name for name in states if not states[name]['goal'])
+    states[name]['heuristic'] = states[name].get('heuristic', 0) + 1000
+
+    with open(json_copy, 'w') as f:
+        json.dump(states, f)
+    model, info = load(json_copy)
+    assert not info['cache_hit']
+    assert model.heuristic[model.index[name]] == states[name]['heuristic']
+
+
+def test_same_size_edit_with_new_mtime_invalidates_the_cache(json_copy):
+    load(json_copy)
+    with open(json_copy) as f:
+        text = f.read()
+    # Swap two digits of a probability, keeping the size of the file
+    edited = text.replace('0.2', '0.3', 1) if '0.2' in text else text.replace('0.4', '0.5', 1)
+    assert edited != text and len(edited) == len(text)
+    with open(json_copy, 'w') as f:
+        f.write(edited)
+    info = os.stat(json_copy)
+    os.utime(json_copy, ns=(info.st_atime_ns, info.st_mtime_ns + 10**9))
+    model, info = load(json_copy)
+    assert not info['cache_hit']
+    assert_same_model(stream_model(json_copy), model)
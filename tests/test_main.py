@@ -0,0 +1,21 @@
+import csv
+
+import pytest
+
+from conftest import map_path
+from iteration_value import value_iteration
+from main import policy_iteration_test, run_and_profile
+from utils import load_json
+
+
+@pytest.mark.parametrize('algorithm, name', [(policy_iteration_test, 'test.json'),
+                                             (value_iteration, 'navigator3-15-0-0.json')])
+def test_results_file(tmp_path, capsys, algorithm, name):
+    path = str(tmp_path / 'results.csv')
+    record = run_and_profile(map_path(name), algorithm, 0.9, 1e-6, name, results_file=path)
+    V, policy, _ = algorithm(load_json(map_path(name)), gamma=0.9, epsilon=1e-6)
+    with open(path, newline='') as f:
+        rows = {row['state']: row for row in csv.DictReader(f)}
+    assert record['iterations'] > 0
+    assert all(rows[state]['action'] == action for state, action in policy.items())
+    assert all(abs(float(rows[state]['value']) - value) < 1e-9 for state, value in V.items())
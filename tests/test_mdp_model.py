@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+import iteration_policy_test
+from conftest import map_path
+from iteration_policy import policy_iteration
+from iteration_value import value_iteration
+from mdp_model import compile_model, deadend_model, default_penalty
+from utils import load_json
+
+
+def deadend_names(model):
+    return [model.name_list()[s] for s in np.flatnonzero(model.deadend)]
+
+
+def test_legacy_keeps_the_model(model):
+    assert deadend_model(model, 'legacy') is model
+    _, policy, _ = value_iteration(model, gamma=0.9)
+    assert all(policy[name] == 'deadend' for name in deadend_names(model))
+
+
+def test_default_penalty(model):
+    assert default_penalty(model) == model.n_states * np.max(model.C[np.isfinite(model.C) & ~model.goal])
+
+
+@pytest.mark.parametrize('gamma', [0.9, 0.99])
+def test_penalty_dead_ends_cost_the_penalty(model, gamma):
+    penalized = deadend_model(model, 'penalty', 50.0)
+    V, policy, _ = value_iteration(penalized, gamma=gamma, epsilon=1e-10)
+    for name in deadend_names(model):
+        assert V[name] == 50.0
+        assert policy[name] in model.actions
+
+
+@pytest.mark.parametrize('solver', [value_iteration, policy_iteration])
+def test_absorbing_dead_ends_cost_the_penalty_per_step(model, solver):
+    absorbing = deadend_model(model, 'absorbing', 2.0)
+    V, policy, _ = solver(absorbing, gamma=0.9, epsilon=1e-10)
+    for name in deadend_names(model):
+        assert V[name] == pytest.approx(2.0 / (1 - 0.9))
+        assert policy[name] in model.actions
+
+
+def test_unknown_handling(model):
+    with pytest.raises(ValueError):
+        deadend_model(model, 'ignore')
+
+
+def test_weighted_map_matches_the_dictionary_solver():
+    states = load_json(map_path('test.json'))
+    model = compile_model(states)
+    assert model.costs is not None
+    V_ref, policy_ref, _ = iteration_policy_test.policy_iteration(states, gamma=0.9, epsilon=1e-10)
+    for V, policy, _ in (value_iteration(model, gamma=0.9, epsilon=1e-10),
+                         policy_iteration(model, gamma=0.9, epsilon=1e-10),
+                         policy_iteration(states, gamma=0.9, epsilon=1e-10, backend='python')):
+        assert all(abs(V[s] - V_ref[s]) < 1e-8 for s in V_ref)
+        assert {s: policy[s] for s in policy_ref} == policy_ref
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from generator import navigator_model
+from iteration_policy import policy_iteration
+from iteration_value import value_iteration
+from parallel import partition_states
+
+
+@pytest.fixture(scope='module')
+def grid():
+    return navigator_model(12, 9, (0.2, 0.8))
+
+
+def test_partition_covers_the_states_in_whole_grid_rows(grid):
+    blocks = partition_states(grid, 4, nx=12)
+    assert np.array_equal(np.sort(np.concatenate(blocks)), np.arange(grid.n_states))
+    rows = [{(int(grid.names[s]) - 1) // 12 for s in block} for block in blocks]
+    assert all(not a & b for i, a in enumerate(rows) for b in rows[i + 1:])
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_value_iteration_is_identical_to_one_process(grid, workers):
+    V, policy, iterations = value_iteration(grid, gamma=0.95, epsilon=1e-8, output='float64')
+    V_parallel, policy_parallel, iterations_parallel = value_iteration(grid, gamma=0.95, epsilon=1e-8, output='float64',
+                                                                       workers=workers, nx=12)
+    assert iterations_parallel == iterations
+    np.testing.assert_array_equal(V_parallel.array, V.array)
+    np.testing.assert_array_equal(policy_parallel.codes, policy.codes)
+
+
+@pytest.mark.parametrize('evaluation', ['iterative', 'modified'])
+def test_policy_iteration_is_identical_to_one_process(grid, evaluation):
+    V, policy, iterations = policy_iteration(grid, gamma=0.95, epsilon=1e-8, evaluation=evaluation, output='float64')
+    V_parallel, policy_parallel, iterations_parallel = policy_iteration(grid, gamma=0.95, epsilon=1e-8,
+                                                                        evaluation=evaluation, output='float64',
+                                                                        workers=2, nx=12)
+    assert iterations_parallel == iterations
+    np.testing.assert_array_equal(V_parallel.array, V.array)
+    np.testing.assert_array_equal(policy_parallel.codes, policy.codes)
+
+
+def test_parallel_rejects_in_place_schemes(grid):
+    with pytest.raises(ValueError):
+        value_iteration(grid, scheme='gauss-seidel', workers=2)
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from conftest import map_path
+from iteration_value import value_iteration
+from rendering import (ACTION_CODES, CELL_COLORS, DEADEND, EMPTY, GOAL, OTHER, policy_grid, rasterize_policy,
+                       render_policies, save_policy_raster)
+from utils import load_json
+
+
+@pytest.fixture(scope='module')
+def policy():
+    _, policy, _ = value_iteration(load_json(map_path('navigator3-15-0-0.json')), gamma=0.9, epsilon=1e-6)
+    return policy
+
+
+def test_policy_grid_layout(policy):
+    grid = policy_grid(policy, 3, 15)
+    assert grid.shape == (16, 3)
+    for state, action in policy.items():
+        row, col = divmod(int(state) - 1, 3)
+        expected = GOAL if action == 'goal' else DEADEND if action == 'deadend' else ACTION_CODES[action]
+        assert grid[row, col] == expected
+    # The dead end 46 is the first cell of the extra bottom row, the rest of the row is empty
+    assert grid[15, 0] == DEADEND
+    assert (grid[15, 1:] == EMPTY).all()
+
+
+def test_policy_grid_unknown_actions_and_outside_states():
+    grid = policy_grid({'1': 'jump', '2': 'N', '100': 'S'}, 2, 2)
+    assert grid[0, 0] == OTHER
+    assert grid[0, 1] == ACTION_CODES['N']
+    assert np.count_nonzero(grid) == 2
+
+
+@pytest.mark.parametrize('cell', [8, 16])
+def test_rasterize_policy(policy, cell):
+    image = rasterize_policy(policy, 3, 15, cell=cell)
+    assert image.shape == (16 * cell, 3 * cell, 3)
+    assert image.dtype == np.uint8
+    grid = policy_grid(policy, 3, 15)
+    for code in (GOAL, DEADEND, EMPTY):
+        row, col = np.argwhere(grid == code)[0]
+        # Away from the grid lines a cell without arrow is filled with its color
+        block = image[row * cell + 1:(row + 1) * cell, col * cell + 1:(col + 1) * cell]
+        assert (block == CELL_COLORS[code]).all()
+    # Cells with the same action are identical, cells with different actions are not
+    cells = image.reshape(16, cell, 3, cell, 3).transpose(0, 2, 1, 3, 4)
+    (r1, c1), (r2, c2) = np.argwhere(grid == ACTION_CODES['E'])[:2]
+    assert (cells[r1, c1] == cells[r2, c2]).all()
+    rs, cs = np.argwhere(grid == ACTION_CODES['S'])[0]
+    assert not (cells[r1, c1] == cells[rs, cs]).all()
+
+
+def test_save_policy_raster(policy, tmp_path):
+    import matplotlib.image
+
+    filename = str(tmp_path / 'policy.png')
+    save_policy_raster(policy, 3, 15, filename, cell=8)
+    image = matplotlib.image.imread(filename)
+    assert image.shape[:2] == (16 * 8, 3 * 8)
+    assert np.array_equal((image[..., :3] * 255).round().astype(np.uint8), rasterize_policy(policy, 3, 15, 8))
+
+
+@pytest.mark.parametrize('mode', ['raster', 'vector'])
+def test_render_policies(policy, tmp_path, mode):
+    filenames = [str(tmp_path / f'policy{i}.png') for i in range(2)]
+    assert render_policies([(policy, 3, 15, filename) for filename in filenames], mode, workers=1) == filenames
+    assert all((tmp_path / f'policy{i}.png').stat().st_size > 0 for i in range(2))
+
+
+def test_render_policies_rejects_unknown_mode(policy, tmp_path):
+    with pytest.raises(ValueError, match='rendering mode'):
+        render_policies([(policy, 3, 15, str(tmp_path / 'policy.png'))], 'svg', workers=1)
@@ -0,0 +1,35 @@
+import csv
+
+import numpy as np
+import pytest
+
+from iteration_policy import policy_iteration
+from iteration_value import value_iteration
+from results import write_results
+
+
+@pytest.mark.parametrize('solver', [value_iteration, policy_iteration])
+@pytest.mark.parametrize('output, tolerance', [('float64', 0), ('float32', 1e-4)])
+def test_array_outputs_match_dicts(model, solver, output, tolerance):
+    V, policy, iterations = solver(model, gamma=0.9, epsilon=1e-8)
+    V_view, policy_view, iterations_view = solver(model, gamma=0.9, epsilon=1e-8, output=output)
+    assert iterations_view == iterations
+    assert V_view.array.dtype == np.dtype(output)
+    assert dict(policy_view) == policy
+    assert list(V_view) == list(V)
+    assert max(abs(V_view[s] - V[s]) / max(1, abs(V[s])) for s in V) <= tolerance
+
+
+def test_written_results_round_trip(model, tmp_path):
+    V, policy, _ = value_iteration(model, gamma=0.9, epsilon=1e-8, output='float64')
+    write_results(str(tmp_path / 'out.csv'), model, V, policy, chunk_rows=7)
+    with open(tmp_path / 'out.csv', newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['state'] for row in rows] == model.name_list()
+    assert {row['state']: row['action'] for row in rows} == dict(policy)
+    assert [float(row['value']) for row in rows] == V.array.tolist()
+
+    write_results(str(tmp_path / 'out.npy'), model, V, policy, chunk_rows=7)
+    array = np.load(tmp_path / 'out.npy')
+    np.testing.assert_array_equal(array['value'], V.array)
+    np.testing.assert_array_equal(array['action'], policy.codes)
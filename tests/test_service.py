@@ -0,0 +1,125 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from conftest import map_path
+from iteration_value import value_iteration
+from service import SolverService, apply_patch
+
+
+def transitions(model, name):
+    """Transitions of a state as {action: {successor: probability}}."""
+    s = model.index[name]
+    result = dict()
+    for a, _, succ, probs in model.state_actions(s):
+        result[model.actions[a]] = {model.name_list()[t]: p for t, p in zip(succ, probs)}
+    return result
+
+
+def deadend_name(model):
+    return model.name_list()[np.flatnonzero(model.deadend)[0]]
+
+
+def test_deadend_edit(model):
+    name = model.name_list()[0]
+    patched = apply_patch(model, [{'state': name, 'deadend': True}])
+    assert patched.deadend[patched.index[name]]
+    assert transitions(patched, name) == {action: {name: 1.0} for action in model.actions}
+
+
+def test_adj_edit(model):
+    first, second = model.name_list()[:2]
+    patched = apply_patch(model, [{'state': first, 'Adj': [{'name': second, 'cost': 2,
+                                                            'A': {model.actions[0]: 1.0}}]}])
+    assert transitions(patched, first) == {model.actions[0]: {second: 1.0}}
+    assert patched.C[0, patched.index[first]] == 2
+    # The other states keep their transitions
+    assert transitions(patched, second) == transitions(model, second)
+
+
+def test_slip_edit_only_rescales_actions_into_a_dead_end(model):
+    first, second = model.name_list()[:2]
+    deadend = deadend_name(model)
+    north, south = model.actions[0], model.actions[2]
+    mixed = apply_patch(model, [{'state': first, 'Adj': [{'name': deadend, 'A': {north: 0.2}},
+                                                         {'name': second, 'A': {north: 0.8, south: 1.0}}]}])
+    patched = apply_patch(mixed, [{'state': first, 'slip': 0.5}])
+    result = transitions(patched, first)
+    assert result[north] == pytest.approx({deadend: 0.5, second: 0.5})
+    assert result[south] == {second: 1.0}
+
+
+def test_slip_edit_needs_a_dead_end_successor(model):
+    with pytest.raises(ValueError):
+        apply_patch(model, [{'state': model.name_list()[0], 'slip': 0.5}])
+
+
+def test_unknown_state(model):
+    with pytest.raises(ValueError):
+        apply_patch(model, [{'state': 'missing', 'deadend': True}])
+
+
+@pytest.mark.parametrize('state', [5, 20])
+def test_patch_matches_value_iteration(state):
+    path = map_path('navigator3-15-0-0.json')
+    service = SolverService()
+    model = service.entry(path).model
+    edits = [{'state': model.name_list()[state], 'deadend': True}]
+    response = service.dispatch({'op': 'patch', 'map': path, 'edits': edits, 'gamma': 0.9, 'epsilon': 1e-10})
+    assert not response['cached']
+    V, policy, _ = value_iteration(apply_patch(model, edits), gamma=0.9, epsilon=1e-10)
+    assert response['policy'] == policy
+    cached = service.dispatch({'op': 'solve', 'map': response['map'], 'gamma': 0.9, 'epsilon': 1e-10})
+    assert cached['cached'] and cached['policy'] == policy
+
+
+class _Writer:
+    def __init__(self):
+        self.lines = []
+
+    def write(self, data):
+        self.lines.extend(json.loads(line) for line in data.decode().splitlines())
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def serve_lines(service, lines):
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b''.join(line + b'\n' for line in lines))
+        reader.feed_eof()
+        writer = _Writer()
+        await service.handle(reader, writer)
+        return writer.lines
+    return asyncio.run(run())
+
+
+def test_handle_replies_to_invalid_requests():
+    responses = serve_lines(SolverService(), [b'[1, 2]', b'"solve"', b'not json', b'{"op": "nope"}',
+                                              b'{"op": "stats"}'])
+    assert [response['ok'] for response in responses] == [False, False, False, False, True]
+    assert all('error' in response for response in responses[:4])
+
+
+@pytest.mark.parametrize('edits', ['x', ['x'], [{'state': '1', 'Adj': ['x']}],
+                                   [{'state': '1', 'Adj': [{'name': '2', 'A': [1]}]}]])
+def test_malformed_edits(model, edits):
+    with pytest.raises(ValueError):
+        apply_patch(model, edits)
+
+
+def test_handle_rejects_bad_parameters_and_edits():
+    path = map_path('navigator3-15-0-0.json')
+    requests = [{'op': 'solve', 'map': path, 'gamma': 1.0},
+                {'op': 'solve', 'map': path, 'gamma': 0},
+                {'op': 'solve', 'map': path, 'epsilon': 0},
+                {'op': 'patch', 'map': path, 'edits': ['x']},
+                {'op': 'solve', 'map': path}]
+    responses = serve_lines(SolverService(), [json.dumps(request).encode() for request in requests])
+    assert [response['ok'] for response in responses] == [False, False, False, False, True]
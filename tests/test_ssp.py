@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from iteration_value import value_iteration
+from mdp_model import deadend_model, default_penalty
+from service import apply_patch
+from ssp import SSP_METHODS, goal_statistics, proper_policy, ssp_model, ssp_solve
+
+
+def test_finds_the_dead_ends_of_the_file(model):
+    result, analysis = ssp_model(model)
+    assert analysis['deadends'] == int(model.deadend.sum())
+    np.testing.assert_array_equal(result.deadend, model.deadend)
+    assert analysis['penalty'] == default_penalty(model)
+
+
+def test_finds_unflagged_dead_ends(model):
+    names = model.name_list()
+    deadend = names[np.flatnonzero(model.deadend)[0]]
+    first, second = names[:2]
+    # A trap that only loops on itself, and a state that can only fall into the dead end
+    patched = apply_patch(model, [{'state': first, 'Adj': [{'name': first, 'A': {model.actions[0]: 1.0}}]},
+                                  {'state': second, 'Adj': [{'name': deadend, 'A': {model.actions[0]: 1.0}}]}])
+    assert not patched.deadend[[patched.index[first], patched.index[second]]].any()
+    result, analysis = ssp_model(patched)
+    assert analysis['deadends'] == int(model.deadend.sum()) + 2
+    assert result.deadend[[result.index[first], result.index[second]]].all()
+    V, policy, _ = ssp_solve(patched)
+    assert V[first] == V[second] == analysis['penalty']
+    assert policy[first] == policy[second] == 'deadend'
+
+
+def test_rejects_free_actions(model):
+    free = deadend_model(model, 'absorbing', 0.0)
+    with pytest.raises(ValueError):
+        ssp_model(free)
+
+
+@pytest.mark.parametrize('method', SSP_METHODS)
+def test_methods_match_undiscounted_value_iteration(model, method):
+    # The penalty model of deadend_model has the same optimum as the SSP model
+    V, policy, _ = value_iteration(deadend_model(model, 'penalty'), gamma=1.0, epsilon=1e-12)
+    stats = dict()
+    V_ssp, policy_ssp, _ = ssp_solve(model, epsilon=1e-10, method=method, stats=stats)
+    start = model.name_list()[0]
+    if method == 'lao_star':
+        # Only the states of the solution graph of the initial state are solved exactly
+        assert abs(V_ssp[start] - V[start]) < 1e-6
+        assert policy_ssp[start] == policy[start]
+        return
+    assert max(abs(V_ssp[s] - V[s]) for s in V) < 1e-6
+    assert all(policy_ssp[s] == policy[s] for s in V if not model.deadend[model.index[s]])
+
+
+@pytest.mark.parametrize('output', ['dict', 'float64'])
+def test_values_split_into_steps_and_dead_end_risk(model, output):
+    stats = dict()
+    V, _, _ = ssp_solve(model, epsilon=1e-10, stats=stats, output=output)
+    steps, probability = stats['expected_steps'], stats['goal_probability']
+    for name in V:
+        assert V[name] == pytest.approx(steps[name] + stats['penalty'] * (1 - probability[name]))
+    assert all(probability[name] == 1 for name in model.name_list() if model.goal[model.index[name]])
+
+
+def test_proper_policy_reaches_a_terminal_state(model):
+    result, _ = ssp_model(model)
+    steps, probability = goal_statistics(result, proper_policy(result))
+    assert np.all(np.isfinite(steps)) and np.all((0 <= probability) & (probability <= 1 + 1e-12))
@@ -0,0 +1,37 @@
+import tracemalloc
+
+import sweep
+from conftest import map_path
+from iteration_value import value_iteration
+
+
+def test_memory_is_measured_outside_the_timed_solve(monkeypatch):
+    tracing = []
+
+    def traced_value_iteration(model, **options):
+        tracing.append(tracemalloc.is_tracing())
+        return value_iteration(model, **options)
+
+    monkeypatch.setitem(sweep.SOLVERS, 'value_iteration', traced_value_iteration)
+    case, = sweep.build_grid([map_path('navigator3-15-0-0.json')], ['value_iteration'], [0.9], [1e-6])
+    record, V, policy = sweep.solve_case(case)
+    assert tracing == [False, True]
+    assert record['memory_peak_kb'] > 0
+    assert V == value_iteration(sweep.get_instance(case['file_path'])[0], gamma=0.9, epsilon=1e-6)[0]
+
+
+def test_warm_start_chain_matches_cold_runs():
+    cases = sweep.build_grid([map_path('navigator4-10-0-0.json')], ['value_iteration', 'policy_iteration'],
+                             [0.9, 0.99], [1e-4, 1e-8])
+    for chain in sweep.warm_start_chains(cases):
+        assert [(case['gamma'], case['epsilon']) for case in chain] == [(0.9, 1e-4), (0.9, 1e-8),
+                                                                       (0.99, 1e-4), (0.99, 1e-8)]
+        warm_start = None
+        for case in chain:
+            record, V, policy = sweep.solve_case(case, warm_start)
+            cold, V_cold, policy_cold = sweep.solve_case(case)
+            assert dict(policy) == dict(policy_cold)
+            assert max(abs(V[s] - V_cold[s]) for s in V_cold) < case['epsilon'] / (1 - case['gamma'])
+            if warm_start is not None:
+                assert record['warm_start'] and record['iterations'] <= cold['iterations']
+            warm_start = (case, V, policy)
@@ -0,0 +1,37 @@
+import json
+
+import pytest
+
+from iteration_policy import policy_iteration
+from iteration_value import value_iteration
+from telemetry import JSONLSink, Tracer
+
+
+@pytest.mark.parametrize('solver', [value_iteration, policy_iteration])
+def test_tracing_does_not_change_the_solution(model, solver):
+    V, policy, iterations = solver(model, gamma=0.9)
+    tracer = Tracer(keep=True)
+    stats = dict()
+    V_traced, policy_traced, iterations_traced = solver(model, gamma=0.9, tracer=tracer, stats=stats)
+    assert (V_traced, policy_traced, iterations_traced) == (V, policy, iterations)
+    assert [record['iteration'] for record in tracer.records] == list(range(1, iterations + 1))
+    assert stats['stop_reason'] is None
+
+
+def test_backup_budget_stops_the_run(model):
+    tracer = Tracer(max_backups=3 * model.n_states)
+    stats = dict()
+    _, policy, iterations = value_iteration(model, gamma=0.99, tracer=tracer, stats=stats)
+    assert iterations == 3
+    assert stats['stop_reason'] == 'backup_budget'
+    assert set(policy) == set(model.name_list())
+
+
+def test_jsonl_sink(model, tmp_path):
+    path = str(tmp_path / 'trace.jsonl')
+    with Tracer([JSONLSink(path)]) as tracer:
+        _, _, iterations = value_iteration(model, gamma=0.9, tracer=tracer)
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == iterations
+    assert records[-1]['residual'] < 1e-6 and records[-1]['solver'] == 'value_iteration'
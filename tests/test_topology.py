@@ -0,0 +1,21 @@
+import numpy as np
+
+from topology import goal_distance, goal_reachable, strongly_connected_components
+
+
+def test_only_the_dead_end_cannot_reach_the_goal(model):
+    reachable = goal_reachable(model)
+    assert np.array_equal(~reachable, model.deadend)
+
+
+def test_goal_distance(model):
+    distance = goal_distance(model)
+    assert np.all(distance[model.goal] == 0)
+    assert np.all(np.isinf(distance[model.deadend]))
+    assert np.all(np.isfinite(distance[~model.deadend]))
+
+
+def test_components_cover_every_state_once(model):
+    components = strongly_connected_components(model)
+    states = np.concatenate(components)
+    assert np.array_equal(np.sort(states), np.arange(model.n_states))
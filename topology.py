@@ -0,0 +1,179 @@
+"""Graph analysis of the compiled MDP: goal reachability and strongly connected components"""
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import breadth_first_order, connected_components, shortest_path
+
+
+def successor_graph(model):
+    """
+    Build the state graph of a compiled model, with an edge s -> t if some action can lead from s to t.
+
+    Args:
+        model (MDPModel): The compiled model.
+
+    Returns:
+        scipy.sparse.csr_matrix: Boolean adjacency matrix of shape (n_states, n_states).
+    """
+    n = model.n_states
+    T = model.T.tocoo()
+    G = sp.csr_matrix((np.ones(T.nnz, dtype=bool), (T.row % n, T.col)), shape=(n, n))
+    G.sum_duplicates()
+    return G
+
+
+def _reverse_graph(model, graph):
+    """Reverse the state graph and add a virtual node, numbered n_states, linked to every goal state."""
+    n = model.n_states
+    R = graph.T.tocoo()
+    goals = np.flatnonzero(model.goal)
+    rows = np.concatenate([R.row, np.full(len(goals), n)])
+    cols = np.concatenate([R.col, goals])
+    return sp.csr_matrix((np.ones(len(rows), dtype=bool), (rows, cols)), shape=(n + 1, n + 1))
+
+
+def goal_reachable(model, graph=None):
+    """
+    Find the states from which some goal state can be reached.
+
+    Args:
+        model (MDPModel): The compiled model.
+        graph (scipy.sparse.csr_matrix, optional): Precomputed result of `successor_graph`.
+
+    Returns:
+        np.ndarray: Boolean flag per state, True if a goal state is reachable.
+    """
+    n = model.n_states
+    G = successor_graph(model) if graph is None else graph
+    # Search backwards from a virtual node linked to every goal state
+    order = breadth_first_order(_reverse_graph(model, G), n, directed=True, return_predecessors=False)
+    reachable = np.zeros(n + 1, dtype=bool)
+    reachable[order] = True
+    return reachable[:n]
+
+
+def goal_distance(model, graph=None):
+    """
+    Compute the smallest number of transitions from each state to a goal state.
+
+    Args:
+        model (MDPModel): The compiled model.
+        graph (scipy.sparse.csr_matrix, optional): Precomputed result of `successor_graph`.
+
+    Returns:
+        np.ndarray: Distance per state, 0 for goal states and inf for states that cannot reach a goal.
+    """
+    n = model.n_states
+    G = successor_graph(model) if graph is None else graph
+    distance = shortest_path(_reverse_graph(model, G), directed=True, unweighted=True, indices=n)
+    return distance[:n] - 1
+
+
+def strongly_connected_components(model, graph=None):
+    """
+    Compute the strongly connected components of the state graph in reverse topological order.
+
+    Every component appears after all the components it can reach, so solving them in the returned
+    order sees the values of successor components already fixed.
+
+    Args:
+        model (MDPModel): The compiled model.
+        graph (scipy.sparse.csr_matrix, optional): Precomputed result of `successor_graph`.
+
+    Returns:
+        list: Arrays of state ids, one per component.
+    """
+    G = successor_graph(model) if graph is None else graph
+    n_components, labels = connected_components(G, directed=True, connection='strong')
+
+    # Edges of the condensation, which is a DAG over the components
+    G = G.tocoo()
+    cross = labels[G.row] != labels[G.col]
+    edges = np.unique(np.stack([labels[G.row][cross], labels[G.col][cross]], axis=1), axis=0)
+
+    # Kahn's algorithm on the reversed condensation yields successors first
+    out_degree = np.bincount(edges[:, 0], minlength=n_components)
+    order = np.argsort(edges[:, 1], kind='stable')
+    sources, targets = edges[order, 0], edges[order, 1]
+    starts = np.searchsorted(targets, np.arange(n_components + 1))
+    pending = list(np.flatnonzero(out_degree == 0))
+    topological = []
+    while pending:
+        component = pending.pop()
+        topological.append(component)
+        for predecessor in sources[starts[component]:starts[component + 1]]:
+            out_degree[predecessor] -= 1
+            if out_degree[predecessor] == 0:
+                pending.append(predecessor)
+
+    members = np.argsort(labels, kind='stable')
+    bounds = np.searchsorted(labels[members], np.arange(n_components + 1))
+    return [members[bounds[c]:bounds[c + 1]] for c in topological]
+
+
+def unreachable_values(model, reachable, gamma):
+    """
+    Compute the value of the states that cannot reach a goal without solving them.
+
+    When every action available in those states has the same immediate cost c and keeps the whole
+    probability mass (no terminal dead ends), any policy pays c forever, so their value is c / (1 - gamma).
+
+    Args:
+        model (MDPModel): The compiled model.
+        reachable (np.ndarray): Result of `goal_reachable`.
+        gamma (float): Discount factor for future costs.
+
+    Returns:
+        float or None: The common value, or None if it has no closed form.
+    """
+    costs = model.C[:, ~reachable]
+    available = np.isfinite(costs)
+    costs = costs[available]
+    if gamma >= 1 or len(costs) == 0 or not np.all(costs == costs[0]):
+        return None
+    mass = np.asarray(model.T[component_rows(model, np.flatnonzero(~reachable))].sum(axis=1)).ravel()
+    if not np.allclose(mass[available.ravel()], 1):
+        return None
+    return costs[0] / (1 - gamma)
+
+
+def component_rows(model, component):
+    """
+    Get the stacked transition rows of every action for the states of a component.
+
+    Returns:
+        np.ndarray: Row ids of `model.T`, ordered action by action.
+    """
+    return (np.arange(model.n_actions)[:, None] * model.n_states + component).ravel()
+
+
+def topological_plan(model, V, gamma):
+    """
+    Prepare a topological solve: fix the goal states and the pruned states in `V` and list the
+    components that still have to be solved.
+
+    States that cannot reach a goal are pruned when their value has a closed form
+    (see `unreachable_values`), otherwise they are kept as ordinary components.
+
+    Args:
+        model (MDPModel): The compiled model.
+        V (np.ndarray): Value function, updated in place.
+        gamma (float): Discount factor for future costs.
+
+    Returns:
+        tuple: Components in solving order and number of pruned states.
+    """
+    graph = successor_graph(model)
+    reachable = goal_reachable(model, graph)
+    V[model.goal] = 0
+
+    pruned = np.zeros(model.n_states, dtype=bool)
+    value = unreachable_values(model, reachable, gamma)
+    if value is not None:
+        pruned = ~reachable
+        V[pruned] = value
+
+    skip = model.goal | pruned
+    components = [component for component in strongly_connected_components(model, graph)
+                  if not skip[component[0]]]
+    return components, int(pruned.sum())
@@ -1,9 +1,39 @@
 """Utils functions"""
 
+import csv
 import json
 
+# Columns of the result records, with their titles in the CSV output
+RECORD_HEADERS = {'algorithm': 'Algorithm',
+                  'file_path': 'File Path',
+                  'gamma': 'Gamma',
+                  'epsilon': 'Epsilon',
+                  'random_values': 'Valores iniciales random',
+                  'iterations': 'Iterations',
+                  'load_time_ms': 'Tiempo Carga (ms)',
+                  'model_kb': 'Model Size (KB)',
+                  'tiempo_ejecucion': 'Tiempo Ejecucion (ms)',
+                  'memory_current_kb': 'Memory Current (KB)',
+                  'memory_peak_kb': 'Memory Peak (KB)'}
+
 
 def load_json(file_path):
     with open(file_path, 'r') as f:
         data = json.load(f)
-    return data
\ No newline at end of file
+    return data
+
+
+def write_csv(records, file_path, headers=RECORD_HEADERS):
+    """
+    Write result records to a CSV file with friendly column titles.
+
+    Args:
+        records (list): Result dictionaries, such as the ones returned by `run_and_profile`.
+        file_path (str): Path of the CSV file.
+        headers (dict): Maps each record key to its column title.
+    """
+    with open(file_path, mode='w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(headers.values())
+        for record in records:
+            writer.writerow([record[header] for header in headers])